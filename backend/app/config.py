@@ -9,11 +9,144 @@ class Settings(BaseSettings):
     # 高德地图配置
     amap_api_key: str = ""
     amap_base_url: str = "https://restapi.amap.com/v3"
+    amap_api_keys: str = ""  # 额外的 Key（逗号分隔），与 amap_api_key 一起轮换使用
+    
+    # 高德限流：每个 Key 的 QPS 和自适应并发范围
+    amap_qps_per_key: float = 20.0
+    amap_concurrency_initial: float = 16.0
+    amap_concurrency_min: float = 2.0
+    amap_concurrency_max: float = 64.0
+    amap_queue_timeout: float = 5.0  # 排队超过该时间直接失败
     
     # LLM 配置
     dashscope_api_key: str = ""
     openai_api_key: str = ""
     siliconflow_api_key: str = ""
+    siliconflow_base_url: str = "https://api.siliconflow.cn/v1"
+    dashscope_base_url: str = "https://dashscope.aliyuncs.com/api/v1"
+    openai_base_url: str = ""  # 留空使用官方地址
+    
+    # HTTP 连接池配置
+    http2_enabled: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 5.0
+    
+    # 上游超时（秒）
+    amap_timeout: float = 10.0
+    siliconflow_timeout: float = 30.0
+    dashscope_timeout: float = 30.0
+    openai_timeout: float = 30.0
+    
+    # 周边搜索分页
+    amap_max_pages: int = 3  # 品牌筛选等需要更多候选时最多拉取的页数
+    amap_page_concurrency: int = 3
+    
+    # 多品牌搜索：按品牌（品牌较多时按组）分别并发查询，合并去重后各品牌轮流填充候选
+    brand_fanout_enabled: bool = True
+    brand_fanout_max_groups: int = 4
+    brand_fanout_deadline: float = 3.0  # 各组共享的时限（秒），已有结果后超时未返回的组直接放弃
+    
+    # 周边搜索缓存
+    poi_cache_enabled: bool = True
+    poi_cache_ttl: float = 600.0
+    poi_cache_max_entries: int = 5000
+    poi_cache_geohash_precision: int = 7  # 约 150m × 150m 网格
+    poi_cache_stale_ttl: float = 3600.0  # 过期后仍可作为陈旧数据返回的时间
+    
+    # LLM 解析时限与对冲
+    llm_deadline: float = 10.0  # 超过后直接返回规则引擎结果
+    llm_hedge_enabled: bool = False  # 配置多个服务商时，主服务商慢则并行请求备选
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_delay: float = 2.0  # 耗时样本不足时的对冲延迟（秒）
+    llm_hedge_min_delay: float = 0.3
+    
+    # 路线缓存
+    route_cache_ttl: float = 3600.0
+    route_cache_driving_ttl: float = 300.0  # 驾车受实时路况影响，缓存时间更短
+    route_cache_negative_ttl: float = 30.0  # 无路线结果的缓存时间
+    route_cache_max_entries: int = 10000
+    route_cache_snap_decimals: int = 4  # 坐标保留小数位，4 位约 11 米
+    route_cache_stale_ttl: float = 1800.0
+    
+    # 批量路线
+    route_matrix_enabled: bool = True  # 步行批量规划优先使用高德距离测量接口
+    route_batch_concurrency: int = 5
+    
+    # 查询解析缓存
+    parse_cache_ttl: float = 86400.0
+    parse_cache_max_entries: int = 10000
+    parse_cache_file: str = ""  # 配置后在重启之间持久化
+    parse_cache_stale_ttl: float = 86400.0
+    
+    # 规则引擎扩展词典（JSON），为空时只用内置词条
+    lexicon_file: str = ""
+    
+    # 距离计算方式: haversine / equirectangular（城市范围内误差可忽略，更快）
+    distance_method: str = "haversine"
+    
+    # 地铁站索引
+    subway_stations_file: str = ""  # 本地站点数据（JSON），为空则按需调用高德
+    subway_refresh_city: str = ""  # 配置后在后台定期从高德刷新该城市站点
+    subway_refresh_interval: float = 86400.0
+    subway_index_cell_deg: float = 0.01
+    subway_max_distance: float = 10000.0
+    
+    # 排序评分：距离类评分为 scale / (scale + 距离)，scale 处得分为 0.5
+    rank_distance_scale: float = 1000.0  # 米
+    rank_subway_scale: float = 500.0  # 米
+    rank_cost_scale: float = 100.0  # 元
+    
+    # 熔断器：最近 window 次调用中失败（含慢调用）比例超过阈值时熔断 open_seconds 秒
+    breaker_failure_rate: float = 0.5
+    breaker_window: int = 20
+    breaker_min_calls: int = 10
+    breaker_open_seconds: float = 30.0
+    amap_slow_call_seconds: float = 3.0
+    llm_slow_call_seconds: float = 8.0  # 应小于 llm_deadline，超时取消的调用才会计为慢调用
+    
+    # 本地 POI 库（SQLite），配置文件路径后启用
+    poi_store_file: str = ""
+    poi_store_cell_precision: int = 6  # 新鲜度按 geohash 网格记录，6 位约 1.2km × 0.6km
+    poi_store_ttl: float = 604800.0  # 网格数据超过该时间后在后台刷新（7 天）
+    poi_store_max_age: float = 2592000.0  # 超过该时间不再使用（30 天）
+    poi_store_max_cells: int = 400  # 查询覆盖的网格超过该数量时直接查高德
+    poi_store_cell_max_pages: int = 8  # 每个网格最多拉取的页数，超过则视为不完整
+    poi_store_refresh_interval: float = 30.0
+    poi_store_refresh_batch: int = 10  # 每轮最多刷新的网格数
+    poi_store_demand_window: float = 86400.0  # 只刷新该时间内被查询过的网格
+    poi_store_retry_interval: float = 3600.0  # 不完整的网格重新拉取的最短间隔
+    
+    # 响应序列化：开启后按响应模型校验服务层生成的数据（开发和测试用）
+    validate_responses: bool = False
+    
+    # 跨进程共享缓存（L2）：sqlite 或 redis，留空只使用进程内缓存
+    shared_cache_backend: str = ""
+    shared_cache_file: str = "shared_cache.db"
+    shared_cache_max_entries: int = 200000
+    shared_cache_redis_url: str = "redis://127.0.0.1:6379/0"
+    shared_cache_pool_size: int = 8
+    shared_cache_timeout: float = 0.2  # 单次 L2 操作超时，超时视为未命中（SQLite 后端只限制读取，写入在后台进行）
+    
+    # POI 快照（离线构建的内存映射文件，多个 worker 共享）
+    poi_snapshot_file: str = ""
+    poi_snapshot_check_interval: float = 60.0  # 检查快照文件是否被替换的间隔
+    
+    # 监控指标（/metrics）
+    metrics_enabled: bool = True
+    
+    # 请求追踪：Server-Timing 响应头、抽样导出完整调用树
+    server_timing_enabled: bool = True
+    trace_sample_rate: float = 0.0  # 0~1，抽样比例
+    trace_file: str = ""  # 抽样 Trace 追加写入的 JSONL 文件
+    trace_otlp_endpoint: str = ""  # OTLP/HTTP JSON 采集端，如 http://127.0.0.1:4318/v1/traces
+    trace_service_name: str = "dollynav-backend"
+    trace_export_timeout: float = 5.0
+    
+    # 单请求性能分析（?profile=1），仅在调试环境开启
+    profiling_enabled: bool = False
+    profile_top_n: int = 40
     
     # 服务配置
     host: str = "0.0.0.0"
@@ -22,6 +155,12 @@ class Settings(BaseSettings):
     # CORS 配置
     cors_origins: list = ["http://localhost:3000", "http://127.0.0.1:3000"]
     
+    def amap_keys(self) -> list:
+        """全部高德 Key（去重，保持顺序）"""
+        keys = [self.amap_api_key] + [key.strip() for key in self.amap_api_keys.split(",")]
+        unique = list(dict.fromkeys(key for key in keys if key))
+        return unique or [""]
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,18 +1,45 @@
 """FastAPI 主应用"""
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
-from app.routers import parse, search, route
+from app.routers import parse, search, route, query, metrics
+from app.services.http_client import init_clients, close_clients
+from app.services import subway_index, poi_store, shared_cache
+from app.services.llm_service import load_parse_cache, save_parse_cache
+from app.services.metrics import MetricsMiddleware
+from app.services.tracing import TracingMiddleware
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时建立上游连接池、共享缓存、地铁站索引、POI 库和解析缓存，关闭时释放"""
+    init_clients()
+    subway_index.init_index()
+    subway_index.start_background_refresh()
+    poi_store.init_store()
+    poi_store.start_background_refresh()
+    load_parse_cache()
+    shared_cache.init_backend()  # 在恢复解析缓存之后，避免每个 worker 把恢复的条目重复写入 L2
+    yield
+    save_parse_cache()
+    await poi_store.stop_background_refresh()
+    poi_store.close_store()
+    await subway_index.stop_background_refresh()
+    await shared_cache.close_backend()
+    await close_clients()
+
+
 # 创建应用
 app = FastAPI(
     title="智能对话导航 API",
     description="基于自然语言的智能导航服务",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS 中间件
@@ -24,10 +51,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求追踪中间件（Server-Timing、抽样 Trace、性能分析）
+app.add_middleware(TracingMiddleware)
+
+# 监控指标中间件
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 app.include_router(parse.router)
 app.include_router(search.router)
 app.include_router(route.router)
+app.include_router(query.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -15,6 +15,12 @@ class ParseQueryRequest(BaseModel):
     location: Location = Field(..., description="用户位置")
 
 
+class QueryRequest(BaseModel):
+    """一站式查询请求（解析 + 搜索 + 排序）"""
+    message: str = Field(..., min_length=1, max_length=500, description="用户查询消息")
+    location: Location = Field(..., description="用户位置")
+
+
 class SearchRequest(BaseModel):
     """搜索请求"""
     category: str = Field(..., description="地点类型")
@@ -24,6 +30,9 @@ class SearchRequest(BaseModel):
     sort_by: Optional[str] = Field(None, description="排序方式")
     brands: Optional[List[str]] = Field(None, description="品牌筛选")
     proximity: Optional[str] = Field(None, description="靠近的地点类型")
+    weights: Optional[Dict[str, float]] = Field(
+        None, description="排序权重（distance、subway、rating、cost、brand），指定后覆盖 sort_by"
+    )
     location: Location = Field(..., description="用户位置")
 
 
@@ -33,3 +42,9 @@ class RouteRequest(BaseModel):
     destination: Location = Field(..., description="终点")
     mode: str = Field("walking", description="出行方式: walking, driving, transit")
 
+
+class RouteBatchRequest(BaseModel):
+    """批量路线请求（一个起点，多个终点）"""
+    origin: Location = Field(..., description="起点")
+    destinations: List[Location] = Field(..., min_length=1, max_length=50, description="终点列表")
+    mode: str = Field("walking", description="出行方式: walking, driving, transit")
@@ -15,12 +15,13 @@ class POIResult(BaseModel):
     """POI 搜索结果"""
     id: str
     name: str
-    category: str
+    category: Optional[str] = None
     brand: Optional[str] = None
     location: Dict[str, float]
     address: str
     distance: float  # 距离用户（米）
     rating: Optional[float] = None
+    cost: Optional[float] = None  # 人均消费（元）
     phone: Optional[str] = None
     nearest_subway: Optional[SubwayInfo] = None
 
@@ -43,10 +44,31 @@ class ParseQueryResponse(BaseModel):
     message: Optional[str] = None
 
 
+class SearchData(BaseModel):
+    """搜索结果"""
+    total: int
+    results: List[POIResult]
+
+
 class SearchResponse(BaseModel):
     """搜索响应"""
     success: bool
-    data: Dict[str, Any]
+    data: SearchData
+    message: Optional[str] = None
+
+
+class QueryData(BaseModel):
+    """一站式查询结果"""
+    query: ParsedQuery
+    display: Dict[str, str]
+    total: int
+    results: List[POIResult]
+
+
+class QueryResponse(BaseModel):
+    """一站式查询响应"""
+    success: bool
+    data: QueryData
     message: Optional[str] = None
 
 
@@ -57,9 +79,30 @@ class RouteStep(BaseModel):
     duration: float
 
 
+class RouteData(BaseModel):
+    """路线规划结果"""
+    distance: float  # 米
+    duration: float  # 分钟
+    mode: str
+    steps: List[RouteStep]
+
+
 class RouteResponse(BaseModel):
     """路线响应"""
     success: bool
-    data: Optional[Dict[str, Any]] = None
+    data: Optional[RouteData] = None
     message: Optional[str] = None
 
+
+class RouteMatrixEntry(BaseModel):
+    """单个终点的距离和耗时"""
+    index: int
+    distance: Optional[float] = None  # 米
+    duration: Optional[float] = None  # 分钟
+
+
+class RouteBatchResponse(BaseModel):
+    """批量路线响应"""
+    success: bool
+    data: List[RouteMatrixEntry]
+    message: Optional[str] = None
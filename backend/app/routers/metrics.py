@@ -0,0 +1,90 @@
+"""监控指标路由"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services import poi_store
+from app.services.amap_service import poi_cache, route_cache, amap_flight, amap_gate
+from app.services.circuit_breaker import breakers, CLOSED, HALF_OPEN, OPEN
+from app.services.llm_service import parse_cache, llm_flight
+from app.services.metrics import registry
+from app.services.snapshot import get_snapshot
+
+router = APIRouter(tags=["metrics"])
+
+# 缓存名称 -> 缓存
+CACHES = {"poi": poi_cache, "route": route_cache, "parse": parse_cache}
+
+BREAKER_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def collect_caches():
+    """缓存命中统计"""
+    stats = {name: cache.stats() for name, cache in CACHES.items()}
+    for field, metric_type, documentation in (
+        ("hits", "counter", "缓存命中次数"),
+        ("stale_hits", "counter", "返回陈旧数据的次数"),
+        ("misses", "counter", "缓存未命中次数"),
+        ("evictions", "counter", "容量淘汰次数"),
+    ):
+        yield f"cache_{field}_total", metric_type, documentation, [
+            ({"cache": name}, values[field]) for name, values in stats.items()
+        ]
+    for field, documentation in (
+        ("l2_hits", "共享缓存（L2）命中次数"),
+        ("l2_misses", "共享缓存（L2）未命中次数"),
+        ("l2_errors", "共享缓存（L2）读写失败次数"),
+    ):
+        yield f"cache_{field}_total", "counter", documentation, [
+            ({"cache": name}, values[field]) for name, values in stats.items()
+        ]
+    yield "cache_entries", "gauge", "缓存条目数", [
+        ({"cache": name}, values["size"]) for name, values in stats.items()
+    ]
+
+
+def collect_upstreams():
+    """熔断器、限流闸门和请求合并状态"""
+    yield "circuit_breaker_state", "gauge", "熔断器状态（0 关闭，1 半开，2 打开）", [
+        ({"upstream": name}, BREAKER_STATES[breaker.state]) for name, breaker in breakers.items()
+    ]
+    yield "circuit_breaker_rejected_total", "counter", "熔断期间被拒绝的调用次数", [
+        ({"upstream": name}, breaker.rejected) for name, breaker in breakers.items()
+    ]
+    yield "amap_concurrency_limit", "gauge", "高德自适应并发上限", [({}, amap_gate.limit)]
+    yield "amap_in_flight", "gauge", "进行中的高德请求数", [({}, amap_gate.in_flight)]
+    yield "amap_queued", "gauge", "排队等待放行的高德请求数", [({}, amap_gate.queued)]
+    yield "amap_throttled_total", "counter", "高德限流或配额用尽次数", [({}, amap_gate.throttled)]
+    yield "singleflight_shared_total", "counter", "被合并的重复上游调用次数", [
+        ({"flight": "amap"}, amap_flight.shared),
+        ({"flight": "llm"}, llm_flight.shared),
+    ]
+
+
+def collect_poi_store():
+    """本地 POI 库命中统计"""
+    store = poi_store.get_store()
+    if store is None:
+        return
+    yield "poi_store_hits_total", "counter", "本地 POI 库直接返回的查询次数", [({}, store.hits)]
+    yield "poi_store_misses_total", "counter", "本地 POI 库覆盖不完整、回退到高德的查询次数", [({}, store.misses)]
+
+
+def collect_poi_snapshot():
+    """POI 快照命中统计"""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return
+    yield "poi_snapshot_entries", "gauge", "POI 快照中的 POI 数", [({}, len(snapshot))]
+    yield "poi_snapshot_hits_total", "counter", "POI 快照直接返回的查询次数", [({}, snapshot.hits)]
+    yield "poi_snapshot_misses_total", "counter", "POI 快照覆盖不完整的查询次数", [({}, snapshot.misses)]
+
+
+registry.register_collector(collect_caches)
+registry.register_collector(collect_poi_store)
+registry.register_collector(collect_poi_snapshot)
+registry.register_collector(collect_upstreams)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 格式的监控指标"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,121 @@
+"""一站式查询路由 - 解析、搜索、排序一次完成"""
+import asyncio
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, HTTPException
+from app.models.request import QueryRequest
+from app.models.response import QueryResponse, ParsedQuery
+from app.routers.parse import to_parsed_query, build_display
+from app.services import subway_index
+from app.services.amap_service import search_subway_stations
+from app.services.llm_service import parse_query_with_llm, parse_with_rules
+from app.services.poi import to_dicts
+from app.services.ranking_service import rank_results
+from app.services.rate_limit import PRIORITY_SEARCH
+from app.services.search_service import build_keywords, fetch_candidates, needs_subway, needs_detail
+from app.services.serialization import typed_response
+from app.services.tracing import TimedRoute, span
+
+router = APIRouter(prefix="/api", tags=["query"], route_class=TimedRoute)
+
+
+@router.post("/query", response_model=QueryResponse)
+async def query(request: QueryRequest):
+    """解析自然语言查询并返回排序后的地点
+
+    LLM 解析期间先按规则引擎的结果投机执行搜索（以及地铁站预取），
+    LLM 结果的搜索参数与之一致时直接复用，否则丢弃并重新搜索。
+    """
+    location = {"lat": request.location.lat, "lng": request.location.lng}
+    speculative: Optional[asyncio.Task] = None
+
+    try:
+        # 规则引擎结果几乎无耗时，立即开始投机搜索
+        guess = to_parsed_query(parse_with_rules(request.message))
+        guess_params = search_params(guess)
+        speculative = start_search(location, guess, guess_params)
+
+        with span("parse"):
+            data = to_parsed_query(await parse_query_with_llm(request.message, location))
+        params = search_params(data)
+
+        if params == guess_params:
+            pois = await speculative
+        else:
+            discard(speculative)
+            pois = await start_search(location, data, params)
+        speculative = None
+
+        display = build_display(data)
+        if not pois:
+            return typed_response(
+                QueryResponse,
+                success=False,
+                data={"query": data.model_dump(), "display": display, "total": 0, "results": []},
+                message="未找到符合条件的地点，请尝试放宽搜索条件"
+            )
+
+        filters = data.filters or {}
+        with span("rank"):
+            ranked_pois = await rank_results(
+                pois=pois,
+                user_location=location,
+                sort_by=data.sort_by,
+                proximity=filters.get("proximity"),
+                brands=filters.get("brands"),
+                limit=params["limit"]
+            )
+
+        return typed_response(
+            QueryResponse,
+            success=True,
+            data={"query": data.model_dump(), "display": display, "total": len(ranked_pois), "results": to_dicts(ranked_pois)},
+            message=None
+        )
+
+    except Exception as e:
+        if speculative is not None:
+            discard(speculative)
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+
+
+def search_params(data: ParsedQuery) -> Dict[str, Any]:
+    """取出决定上游搜索的参数，范围与 SearchRequest 一致"""
+    filters = data.filters or {}
+    return {
+        "category": data.category,
+        "radius": min(max(data.radius, 100), 50000),
+        "limit": min(max(data.limit, 1), 20),
+        "keywords": build_keywords(filters.get("brands"), data.subcategory),
+        "brands": filters.get("brands"),
+        "detail": needs_detail(data.sort_by),
+    }
+
+
+def start_search(location: Dict[str, float], data: ParsedQuery, params: Dict[str, Any]) -> asyncio.Task:
+    """后台启动候选搜索，排序需要地铁站且没有本地索引时一并预取"""
+    filters = data.filters or {}
+
+    async def search():
+        with span("amap_search"):
+            return await fetch_candidates(location=location, **params)
+    
+    async def prefetch_subway():
+        with span("subway"):
+            # 排序会立即用到（与排序时的查询合并为同一次上游调用），按搜索优先级排队
+            return await search_subway_stations(location=location, radius=10000, priority=PRIORITY_SEARCH)
+    
+    async def run():
+        tasks = [search()]
+        if needs_subway(data.sort_by, filters.get("proximity")) and subway_index.get_index() is None:
+            # 预取结果进入周边搜索缓存，排序时直接命中
+            tasks.append(prefetch_subway())
+        results = await asyncio.gather(*tasks)
+        return results[0]
+
+    return asyncio.create_task(run())
+
+
+def discard(task: asyncio.Task) -> None:
+    """取消不再需要的投机任务，并吞掉它的异常"""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
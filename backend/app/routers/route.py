@@ -1,33 +1,67 @@
 """路线规划路由"""
 from fastapi import APIRouter, HTTPException
-from app.models.request import RouteRequest
-from app.models.response import RouteResponse
-from app.services.amap_service import get_route
+from app.models.request import RouteRequest, RouteBatchRequest
+from app.models.response import RouteResponse, RouteBatchResponse
+from app.services.amap_service import get_route, get_route_matrix
+from app.services.serialization import typed_response
+from app.services.tracing import TimedRoute, span
 
-router = APIRouter(prefix="/api", tags=["route"])
+router = APIRouter(prefix="/api", tags=["route"], route_class=TimedRoute)
 
 
 @router.post("/route", response_model=RouteResponse)
 async def plan_route(request: RouteRequest):
     """规划路线"""
     try:
-        route_data = await get_route(
-            origin={"lat": request.origin.lat, "lng": request.origin.lng},
-            destination={"lat": request.destination.lat, "lng": request.destination.lng},
-            mode=request.mode
-        )
+        with span("route"):
+            route_data = await get_route(
+                origin={"lat": request.origin.lat, "lng": request.origin.lng},
+                destination={"lat": request.destination.lat, "lng": request.destination.lng},
+                mode=request.mode
+            )
         
         if not route_data:
-            return RouteResponse(
+            return typed_response(
+                RouteResponse,
                 success=False,
+                data=None,
                 message="无法规划路线，请检查起点和终点"
             )
         
-        return RouteResponse(
+        return typed_response(
+            RouteResponse,
             success=True,
-            data=route_data
+            data=route_data,
+            message=None
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"路线规划失败: {str(e)}")
 
+
+@router.post("/route/batch", response_model=RouteBatchResponse)
+async def plan_routes(request: RouteBatchRequest):
+    """批量计算一个起点到多个终点的距离和耗时"""
+    try:
+        with span("route_matrix"):
+            matrix = await get_route_matrix(
+                origin={"lat": request.origin.lat, "lng": request.origin.lng},
+                destinations=[{"lat": d.lat, "lng": d.lng} for d in request.destinations],
+                mode=request.mode
+            )
+        
+        entries = [
+            {"index": index, "distance": None, "duration": None, **(entry or {})}
+            for index, entry in enumerate(matrix)
+        ]
+        found = any(entry is not None for entry in matrix)
+        
+        return typed_response(
+            RouteBatchResponse,
+            success=found,
+            data=entries,
+            message=None if found else "无法规划路线，请检查起点和终点"
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"路线规划失败: {str(e)}")
@@ -2,55 +2,68 @@
 from fastapi import APIRouter, HTTPException
 from app.models.request import SearchRequest
 from app.models.response import SearchResponse
-from app.services.amap_service import search_nearby_pois
+from app.services.poi import to_dicts
 from app.services.ranking_service import rank_results
+from app.services.scoring import SCORERS
+from app.services.search_service import build_keywords, fetch_candidates, needs_detail
+from app.services.serialization import typed_response
+from app.services.tracing import TimedRoute, span
 
-router = APIRouter(prefix="/api", tags=["search"])
+router = APIRouter(prefix="/api", tags=["search"], route_class=TimedRoute)
 
 
 @router.post("/search", response_model=SearchResponse)
 async def search(request: SearchRequest):
     """搜索地点"""
+    if request.weights:
+        unknown = set(request.weights) - set(SCORERS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"未知的评分项: {', '.join(sorted(unknown))}，可用: {', '.join(SCORERS)}"
+            )
+    
     try:
-        # 构建关键词
-        keywords = None
-        if request.brands:
-            keywords = "|".join(request.brands)
-        elif request.subcategory:
-            keywords = request.subcategory
-        
         # 搜索 POI
-        pois = await search_nearby_pois(
-            location={"lat": request.location.lat, "lng": request.location.lng},
-            category=request.category,
-            radius=request.radius,
-            keywords=keywords,
-            limit=request.limit * 2  # 多获取一些用于筛选
-        )
+        with span("amap_search"):
+            pois = await fetch_candidates(
+                location={"lat": request.location.lat, "lng": request.location.lng},
+                category=request.category,
+                radius=request.radius,
+                limit=request.limit,
+                keywords=build_keywords(request.brands, request.subcategory),
+                brands=request.brands,
+                detail=needs_detail(request.sort_by, request.weights)
+            )
         
         if not pois:
-            return SearchResponse(
+            return typed_response(
+                SearchResponse,
                 success=False,
                 data={"total": 0, "results": []},
                 message="未找到符合条件的地点，请尝试放宽搜索条件"
             )
         
         # 排序和筛选
-        ranked_pois = await rank_results(
-            pois=pois,
-            user_location={"lat": request.location.lat, "lng": request.location.lng},
-            sort_by=request.sort_by,
-            proximity=request.proximity,
-            brands=request.brands,
-            limit=request.limit
-        )
+        with span("rank"):
+            ranked_pois = await rank_results(
+                pois=pois,
+                user_location={"lat": request.location.lat, "lng": request.location.lng},
+                sort_by=request.sort_by,
+                proximity=request.proximity,
+                brands=request.brands,
+                limit=request.limit,
+                weights=request.weights
+            )
         
-        return SearchResponse(
+        return typed_response(
+            SearchResponse,
             success=True,
             data={
                 "total": len(ranked_pois),
-                "results": ranked_pois
-            }
+                "results": to_dicts(ranked_pois)
+            },
+            message=None
         )
         
     except Exception as e:
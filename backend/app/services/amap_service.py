@@ -1,11 +1,62 @@
 """高德地图服务"""
-import httpx
-from typing import List, Dict, Any, Optional
-from app.config import get_settings
+import asyncio
 import math
+import time
+from operator import attrgetter
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from app.config import get_settings
+from app.services.http_client import get_client
+from app.services.cache import BackgroundRefresher
+from app.services.circuit_breaker import breakers, CircuitOpenError
+from app.services.metrics import upstream_requests, upstream_duration
+from app.services.poi import Poi, PoiRow, BRAND_TABLE_VERSION
+from app.services.serialization import loads
+from app.services.tracing import span
+from app.services.singleflight import SingleFlight
+from app.services.shared_cache import SharedCache
+from app.services.rate_limit import (
+    UpstreamGate, PRIORITY_ROUTE, PRIORITY_SEARCH, PRIORITY_PREFETCH,
+    OUTCOME_OK, OUTCOME_THROTTLED, OUTCOME_EXHAUSTED, OUTCOME_ERROR
+)
+from app.services.geo import (
+    geohash_encode, geohash_center, geohash_cell_radius, haversine,
+    distances_one_to_many, to_list
+)
 
 settings = get_settings()
 
+# 周边搜索缓存：(geohash 网格, 类型码, 半径, 关键词, 数量, 页数, 是否详情, 品牌表指纹) -> POI 行（PoiRow）列表
+poi_cache = SharedCache(
+    "poi",
+    max_entries=settings.poi_cache_max_entries,
+    ttl=settings.poi_cache_ttl,
+    stale_ttl=settings.poi_cache_stale_ttl
+)
+
+# 合并并发的相同上游请求
+amap_flight = SingleFlight()
+
+# 限流闸门：多 Key 轮换 + 自适应并发
+amap_gate = UpstreamGate(
+    keys=settings.amap_keys(),
+    qps_per_key=settings.amap_qps_per_key,
+    initial_limit=settings.amap_concurrency_initial,
+    min_limit=settings.amap_concurrency_min,
+    max_limit=settings.amap_concurrency_max,
+    queue_timeout=settings.amap_queue_timeout
+)
+
+# 路线缓存：(出行方式, 起点, 终点)（坐标已吸附）-> 路线，False 表示无路线
+route_cache = SharedCache(
+    "route",
+    max_entries=settings.route_cache_max_entries,
+    ttl=settings.route_cache_ttl,
+    stale_ttl=settings.route_cache_stale_ttl
+)
+
+# 陈旧缓存的后台刷新
+refresher = BackgroundRefresher()
+
 
 # 类型映射
 CATEGORY_MAPPING = {
@@ -22,112 +73,473 @@ CATEGORY_MAPPING = {
 }
 
 
+# 高德 infocode：QPS 超限 / 当日配额用尽
+THROTTLED_INFOCODES = {"10004", "10014", "10015", "10019", "10020", "10021"}
+EXHAUSTED_INFOCODES = {"10003", "10044", "10045"}
+# 路线规划：起终点本身无法规划（海外坐标、附近无道路、超出规划范围），可短暂缓存为无路线
+NO_ROUTE_INFOCODES = {"20011", "20800", "20801", "20802", "20803"}
+
+# 指标子项按路径和结果预先绑定，热路径上不再逐次 labels() 查找
+AMAP_PATHS = (
+    "place/around", "place/text", "place/polygon",
+    "direction/walking", "direction/driving", "direction/integrated", "distance"
+)
+AMAP_OUTCOMES = (
+    OUTCOME_OK, OUTCOME_THROTTLED, OUTCOME_EXHAUSTED, OUTCOME_ERROR,
+    "circuit_open", "queue_timeout", "transport_error"
+)
+# 常见的非 200 状态码，结果标签为 http_<状态码>；其他状态码首次出现时再绑定
+AMAP_HTTP_STATUSES = (400, 403, 404, 408, 429, 500, 502, 503, 504)
+_amap_metrics: Dict[str, Tuple[Dict[Any, Any], Any]] = {}
+
+
+def amap_path_metrics(path: str) -> Tuple[Dict[Any, Any], Any]:
+    """某个接口路径的 (结果或 HTTP 状态码 -> 调用计数子项, 耗时直方图子项)"""
+    metrics = _amap_metrics.get(path)
+    if metrics is None:
+        metrics = (
+            {
+                **{outcome: upstream_requests.labels("amap", path, outcome) for outcome in AMAP_OUTCOMES},
+                **{status: upstream_requests.labels("amap", path, f"http_{status}") for status in AMAP_HTTP_STATUSES},
+            },
+            upstream_duration.labels("amap", path)
+        )
+        _amap_metrics[path] = metrics
+    return metrics
+
+
+for _path in AMAP_PATHS:
+    amap_path_metrics(_path)
+
+# 限流和配额用尽的日志按结果每 THROTTLE_LOG_INTERVAL 秒至多打印一次（次数见 upstream_requests_total）
+THROTTLE_LOG_INTERVAL = 60.0
+_throttle_logs: Dict[str, List[float]] = {}
+
+
+def log_throttled(outcome: str, message: str) -> None:
+    """打印限流日志，时间间隔内的重复日志只计数，下次打印时一并报告"""
+    now = time.monotonic()
+    state = _throttle_logs.setdefault(outcome, [float("-inf"), 0])
+    if now - state[0] < THROTTLE_LOG_INTERVAL:
+        state[1] += 1
+        return
+    suppressed = f"（此前 {THROTTLE_LOG_INTERVAL:.0f} 秒内另有 {state[1]} 次）" if state[1] else ""
+    print(message + suppressed)
+    state[0], state[1] = now, 0
+
+
+async def amap_get(path: str, params: Dict[str, Any], priority: int = PRIORITY_SEARCH) -> Dict[str, Any]:
+    """经熔断器和限流闸门调用高德 Web 服务，返回解析后的 JSON
+
+    熔断打开时立即抛出 CircuitOpenError；HTTP 错误或排队超时时抛出异常。
+    """
+    with span("amap", path=path):
+        requests, duration_histogram = amap_path_metrics(path)
+        breaker = breakers["amap"]
+        if not breaker.allow():
+            requests["circuit_open"].inc()
+            raise CircuitOpenError("高德 API 熔断中")
+        
+        try:
+            key = await amap_gate.acquire(priority)
+        except asyncio.TimeoutError:
+            requests["queue_timeout"].inc()
+            raise
+        outcome = OUTCOME_ERROR
+        started_at = time.monotonic()
+        try:
+            try:
+                response = await get_client("amap").get(
+                    f"{settings.amap_base_url}/{path}",
+                    params={**params, "key": key}
+                )
+            except Exception:
+                breaker.record(False, time.monotonic() - started_at)
+                requests["transport_error"].inc()
+                raise
+            duration = time.monotonic() - started_at
+            breaker.record(response.status_code < 500, duration)
+            duration_histogram.observe(duration)
+            
+            if response.status_code != 200:
+                counter = requests.get(response.status_code)
+                if counter is None:
+                    counter = upstream_requests.labels("amap", path, f"http_{response.status_code}")
+                    requests[response.status_code] = counter
+                counter.inc()
+                raise RuntimeError(f"高德 API HTTP {response.status_code}")
+            
+            with span("decode"):
+                data = loads(response.content)
+            infocode = str(data.get("infocode", ""))
+            if data.get("status") == "1":
+                outcome = OUTCOME_OK
+            elif infocode in THROTTLED_INFOCODES:
+                outcome = OUTCOME_THROTTLED
+                log_throttled(outcome, f"高德 API 限流: {infocode} {data.get('info')}")
+            elif infocode in EXHAUSTED_INFOCODES:
+                outcome = OUTCOME_EXHAUSTED
+                log_throttled(outcome, f"高德 API Key 当日配额已用尽: {infocode} {data.get('info')}")
+            requests[outcome].inc()
+            return data
+        finally:
+            amap_gate.release(key, outcome)
+
+
 async def search_nearby_pois(
     location: Dict[str, float],
     category: str,
     radius: int = 5000,
     keywords: Optional[str] = None,
-    limit: int = 10
-) -> List[Dict[str, Any]]:
-    """搜索附近 POI"""
+    limit: int = 10,
+    max_pages: int = 1,
+    accept: Optional[Callable[[Poi], bool]] = None,
+    want: Optional[int] = None,
+    priority: int = PRIORITY_SEARCH,
+    detail: bool = False
+) -> List[Poi]:
+    """搜索附近 POI
+
+    max_pages > 1 时并发拉取后续分页，直到满足 accept 的 POI 达到 want 个
+    （want 为空时拉满 max_pages 页），并返回全部候选而不截断。
+    detail 为 True 时请求 extensions=all 以获得评分和人均消费，否则只请求基础字段。
+    """
     
     # 获取类型码
     type_code = CATEGORY_MAPPING.get(category, "")
+    offset = min(limit * 2, 50)  # 多获取一些，后续筛选
+    
+    if settings.poi_cache_enabled:
+        # 按 geohash 网格量化位置，同一网格内的用户共享一次上游查询
+        cell = geohash_encode(location["lat"], location["lng"], settings.poi_cache_geohash_precision)
+        # 分页在满足 want 个时提前停止，want 不同拉取的结果也不同，需一并计入键
+        # （accept 由品牌关键词决定，已包含在 keywords 中）
+        cache_key = (cell, type_code, radius, keywords or "", offset, max_pages, want, detail, BRAND_TABLE_VERSION)
+        
+        async def refresh() -> Optional[List[PoiRow]]:
+            center_lat, center_lng = geohash_center(cell)
+            # 从网格中心查询时扩大半径，保证网格内任一点的搜索圆都被覆盖
+            fetch_radius = min(radius + int(geohash_cell_radius(cell)) + 1, 50000)
+            fetched = await fetch_nearby_pois(
+                {"lat": center_lat, "lng": center_lng}, type_code, fetch_radius, keywords, offset,
+                max_pages=max_pages, accept=accept, want=want, priority=priority, detail=detail
+            )
+            if fetched is None:
+                return None
+            rows = [poi.to_row() for poi in fetched]
+            poi_cache.set(cache_key, rows)
+            return rows
+        
+        entry = await poi_cache.lookup(cache_key)
+        if entry is None:
+            rows = await refresh()
+            if rows is None:
+                return []
+        else:
+            rows, fresh = entry
+            if not fresh and not breakers["amap"].is_open():
+                # 先返回陈旧数据，后台刷新
+                refresher.schedule(("place/around",) + cache_key, refresh)
+    else:
+        fetched = await fetch_nearby_pois(
+            location, type_code, radius, keywords, offset,
+            max_pages=max_pages, accept=accept, want=want, priority=priority, detail=detail
+        )
+        if fetched is None:
+            return []
+        rows = [poi.to_row() for poi in fetched]
+    
+    # 按调用方的真实位置批量重新计算距离，每个请求构造自己的 Poi
+    distances = to_list(distances_one_to_many(
+        location["lat"], location["lng"],
+        [row[2] for row in rows],
+        [row[3] for row in rows],
+        settings.distance_method
+    ))
+    results = [
+        Poi.from_row(row, category, distance)
+        for row, distance in zip(rows, distances)
+        if distance <= radius
+    ]
     
+    results.sort(key=attrgetter("distance"))
+    return results if max_pages > 1 else results[:limit * 2]
+
+
+async def fetch_nearby_pois(
+    location: Dict[str, float],
+    type_code: str,
+    radius: int,
+    keywords: Optional[str],
+    offset: int,
+    max_pages: int = 1,
+    accept: Optional[Callable[[Poi], bool]] = None,
+    want: Optional[int] = None,
+    priority: int = PRIORITY_SEARCH,
+    detail: bool = False
+) -> Optional[List[Poi]]:
+    """调用高德周边搜索，返回与调用方无关的 POI 字段；首页请求失败时返回 None
+
+    先取第一页得到总数，再以有限并发拉取剩余分页，按 POI id 去重，
+    满足条件的 POI 够 want 个时取消尚未完成的分页。
+    """
+    first = await fetch_nearby_page(
+        location, type_code, radius, keywords, offset, page=1, priority=priority, detail=detail
+    )
+    if first is None:
+        return None
+    
+    results: List[Poi] = []
+    seen = set()
+    accepted = 0
+    
+    def merge(pois: List[Poi]) -> None:
+        nonlocal accepted
+        for poi in pois:
+            if poi.id and poi.id in seen:
+                continue
+            seen.add(poi.id)
+            results.append(poi)
+            if accept is None or accept(poi):
+                accepted += 1
+    
+    def satisfied() -> bool:
+        return want is not None and accepted >= want
+    
+    pois, total = first
+    merge(pois)
+    pages = min(max_pages, math.ceil(total / offset)) if offset else 1
+    if pages <= 1 or satisfied():
+        return results
+    
+    semaphore = asyncio.Semaphore(settings.amap_page_concurrency)
+    
+    async def fetch_page(page: int):
+        async with semaphore:
+            return await fetch_nearby_page(
+                location, type_code, radius, keywords, offset, page=page, priority=priority, detail=detail
+            )
+    
+    tasks = [asyncio.create_task(fetch_page(page)) for page in range(2, pages + 1)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            page_result = await next_done
+            if page_result is not None:
+                merge(page_result[0])
+            if satisfied():
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    return results
+
+
+async def fetch_nearby_page(
+    location: Dict[str, float],
+    type_code: str,
+    radius: int,
+    keywords: Optional[str],
+    offset: int,
+    page: int = 1,
+    priority: int = PRIORITY_SEARCH,
+    detail: bool = False
+) -> Optional[Tuple[List[Poi], int]]:
+    """请求周边搜索的一页，返回 (POI 列表, 总数)；请求失败时返回 None"""
+    
+    # 并发的相同请求只调用一次上游
+    key = ("place/around", location["lat"], location["lng"], radius, type_code, keywords or "", offset, page, detail)
+    return await amap_flight.do(
+        key, lambda: request_nearby_page(location, type_code, radius, keywords, offset, page, priority, detail)
+    )
+
+
+async def request_nearby_page(
+    location: Dict[str, float],
+    type_code: str,
+    radius: int,
+    keywords: Optional[str],
+    offset: int,
+    page: int,
+    priority: int,
+    detail: bool = False
+) -> Optional[Tuple[List[Poi], int]]:
+    """实际发起周边搜索请求"""
+    
+    # extensions=all 额外返回 biz_ext、照片、室内信息等大字段，只有排序用到评分或价格时才需要
     params = {
-        "key": settings.amap_api_key,
         "location": f"{location['lng']},{location['lat']}",
         "radius": radius,
         "types": type_code,
-        "offset": min(limit * 2, 50),  # 多获取一些，后续筛选
-        "extensions": "all"
+        "offset": offset,
+        "page": page,
+        "extensions": "all" if detail else "base"
     }
     
     if keywords:
         params["keywords"] = keywords
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{settings.amap_base_url}/place/around",
-                params=params
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("status") == "1" and data.get("pois"):
-                    pois = data["pois"]
-                    results = []
-                    
-                    for poi in pois[:limit * 2]:
-                        # 解析位置
-                        loc_str = poi.get("location", "")
-                        if not loc_str or loc_str == "":
-                            continue
-                            
-                        lng, lat = map(float, loc_str.split(","))
-                        
-                        # 计算距离
-                        distance = calculate_distance(
-                            location["lat"], location["lng"],
-                            lat, lng
-                        )
-                        
-                        result = {
-                            "id": poi.get("id", ""),
-                            "name": poi.get("name", ""),
-                            "category": category,
-                            "location": {"lat": lat, "lng": lng},
-                            "address": poi.get("address", ""),
-                            "distance": distance,
-                            "phone": poi.get("tel", ""),
-                        }
-                        
-                        results.append(result)
-                    
-                    return results
+        data = await amap_get("place/around", params, priority)
+        if data.get("status") == "1":
+            return parse_pois(data.get("pois") or []), int(data.get("count") or 0)
                     
     except Exception as e:
         print(f"高德地图 API 调用失败: {e}")
     
-    return []
+    return None
+
+
+def parse_pois(raw_pois: List[Dict[str, Any]]) -> List[Poi]:
+    """把高德返回的 POI 转为内部格式，只取用到的字段，跳过没有坐标的条目"""
+    results = []
+    for poi in raw_pois:
+        # 解析位置
+        loc_str = poi.get("location", "")
+        if not loc_str or not isinstance(loc_str, str):
+            continue
+            
+        lng, lat = map(float, loc_str.split(","))
+        # 评分和人均消费只在 extensions=all 时返回
+        biz_ext = poi.get("biz_ext")
+        if not isinstance(biz_ext, dict):
+            biz_ext = {}
+        
+        results.append(Poi(
+            poi.get("id", ""),
+            poi.get("name", ""),
+            lat,
+            lng,
+            text_field(poi.get("address")),
+            text_field(poi.get("tel")),
+            rating=number_field(biz_ext.get("rating")),
+            cost=number_field(biz_ext.get("cost")),
+        ))
+    return results
+
+
+def text_field(value: Any) -> str:
+    """高德对空字段返回 []，统一转为空字符串"""
+    return value if isinstance(value, str) else ""
+
+
+def number_field(value: Any) -> Optional[float]:
+    """解析高德的数值字段（字符串形式，缺失时为 [] 或空串）"""
+    try:
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def fetch_polygon_pois(
+    bounds: Tuple[float, float, float, float],
+    type_code: str,
+    max_pages: int,
+    priority: int = PRIORITY_PREFETCH
+) -> Tuple[List[Poi], bool]:
+    """拉取矩形区域 (最小纬度, 最大纬度, 最小经度, 最大经度) 内某类 POI
+
+    返回 (POI 列表, 是否完整)；超过 max_pages 页仍未取完时不完整。请求失败时抛出异常。
+    """
+    lat_min, lat_max, lng_min, lng_max = bounds
+    offset = 25
+    results = []
+    for page in range(1, max_pages + 1):
+        data = await amap_get(
+            "place/polygon",
+            {
+                "polygon": f"{lng_min:.6f},{lat_max:.6f}|{lng_max:.6f},{lat_min:.6f}",
+                "types": type_code,
+                "offset": offset,
+                "page": page,
+                "extensions": "base"
+            },
+            priority
+        )
+        if data.get("status") != "1":
+            raise RuntimeError(f"高德 API 返回错误: {data.get('info')}")
+        
+        raw_pois = data.get("pois") or []
+        results.extend(parse_pois(raw_pois))
+        if len(raw_pois) < offset or page * offset >= int(data.get("count") or 0):
+            return results, True
+    return results, False
 
 
 async def search_subway_stations(
     location: Dict[str, float],
-    radius: int = 5000
-) -> List[Dict[str, Any]]:
-    """搜索附近地铁站"""
+    radius: int = 5000,
+    priority: int = PRIORITY_SEARCH
+) -> List[Poi]:
+    """搜索附近地铁站；用户请求路径上的调用使用搜索优先级，后台预热调用方传 PRIORITY_PREFETCH"""
     return await search_nearby_pois(
         location=location,
         category="地铁站",
         radius=radius,
-        limit=20
+        limit=20,
+        priority=priority
     )
 
 
 def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """计算两点间距离（米）- Haversine 公式"""
-    R = 6371000  # 地球半径（米）
+    return haversine(lat1, lng1, lat2, lng2)
+
+
+async def get_route(
+    origin: Dict[str, float],
+    destination: Dict[str, float],
+    mode: str = "walking"
+) -> Optional[Dict[str, Any]]:
+    """获取路线规划"""
     
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lng2 - lng1)
+    # 起终点吸附到网格，附近的相同行程共享缓存
+    origin = snap_location(origin)
+    destination = snap_location(destination)
+    cache_key = (mode, origin["lat"], origin["lng"], destination["lat"], destination["lng"])
     
-    a = math.sin(delta_phi / 2) ** 2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    async def refresh(previous: Any = None) -> Optional[Dict[str, Any]]:
+        route = await amap_flight.do(
+            ("direction",) + cache_key, lambda: fetch_route(origin, destination, mode)
+        )
+        if route is None:
+            if previous:
+                # 已有的路线不被无路线结果覆盖，保留陈旧数据等下次刷新
+                return previous
+            # 短暂缓存无路线结果，避免错误坐标反复请求上游
+            route_cache.set(cache_key, False, ttl=settings.route_cache_negative_ttl)
+        else:
+            ttl = settings.route_cache_driving_ttl if mode == "driving" else settings.route_cache_ttl
+            route_cache.set(cache_key, route, ttl=ttl)
+        return route
     
-    return R * c
+    entry = await route_cache.lookup(cache_key)
+    if entry is not None:
+        cached, fresh = entry
+        if not fresh and not breakers["amap"].is_open():
+            # 先返回陈旧数据，后台刷新
+            refresher.schedule(("direction",) + cache_key, lambda: refresh(cached))
+        return cached or None  # False 表示缓存的无路线结果
+    
+    try:
+        return await refresh()
+    except Exception as e:
+        print(f"路线规划失败: {e}")
+        return None
 
 
-async def get_route(
+def snap_location(location: Dict[str, float]) -> Dict[str, float]:
+    """按配置精度对坐标取整"""
+    decimals = settings.route_cache_snap_decimals
+    return {"lat": round(location["lat"], decimals), "lng": round(location["lng"], decimals)}
+
+
+async def fetch_route(
     origin: Dict[str, float],
     destination: Dict[str, float],
     mode: str = "walking"
 ) -> Optional[Dict[str, Any]]:
-    """获取路线规划"""
+    """调用高德路线规划；无可用路线时返回 None，请求失败（含限流、配额用尽）时抛出异常"""
     
     # 模式映射
     mode_mapping = {
@@ -139,51 +551,109 @@ async def get_route(
     api_mode = mode_mapping.get(mode, "walking")
     
     params = {
-        "key": settings.amap_api_key,
         "origin": f"{origin['lng']},{origin['lat']}",
         "destination": f"{destination['lng']},{destination['lat']}"
     }
     
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{settings.amap_base_url}/direction/{api_mode}",
-                params=params
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("status") == "1":
-                    # 解析路线
-                    if api_mode == "walking":
-                        route = data.get("route", {})
-                        paths = route.get("paths", [])
-                        if paths:
-                            path = paths[0]
-                            return {
-                                "distance": float(path.get("distance", 0)),
-                                "duration": float(path.get("duration", 0)) / 60,  # 转为分钟
-                                "mode": mode,
-                                "steps": parse_steps(path.get("steps", []))
-                            }
-                    elif api_mode == "driving":
-                        route = data.get("route", {})
-                        paths = route.get("paths", [])
-                        if paths:
-                            path = paths[0]
-                            return {
-                                "distance": float(path.get("distance", 0)),
-                                "duration": float(path.get("duration", 0)) / 60,
-                                "mode": mode,
-                                "steps": parse_steps(path.get("steps", []))
-                            }
-                            
-    except Exception as e:
-        print(f"路线规划失败: {e}")
+    data = await amap_get(f"direction/{api_mode}", params, PRIORITY_ROUTE)
+    if data.get("status") != "1":
+        if str(data.get("infocode", "")) in NO_ROUTE_INFOCODES:
+            return None
+        # 限流、配额等错误不能当作无路线缓存
+        raise RuntimeError(f"高德路线规划失败: {data.get('infocode')} {data.get('info')}")
+    
+    # 解析路线
+    if api_mode == "walking":
+        route = data.get("route", {})
+        paths = route.get("paths", [])
+        if paths:
+            path = paths[0]
+            return {
+                "distance": float(path.get("distance", 0)),
+                "duration": float(path.get("duration", 0)) / 60,  # 转为分钟
+                "mode": mode,
+                "steps": parse_steps(path.get("steps", []))
+            }
+    elif api_mode == "driving":
+        route = data.get("route", {})
+        paths = route.get("paths", [])
+        if paths:
+            path = paths[0]
+            return {
+                "distance": float(path.get("distance", 0)),
+                "duration": float(path.get("duration", 0)) / 60,
+                "mode": mode,
+                "steps": parse_steps(path.get("steps", []))
+            }
     
     return None
 
 
+async def get_route_matrix(
+    origin: Dict[str, float],
+    destinations: List[Dict[str, float]],
+    mode: str = "walking"
+) -> List[Optional[Dict[str, float]]]:
+    """一个起点到多个终点的距离和耗时，顺序与 destinations 一致，无法规划的为 None"""
+    
+    results: List[Optional[Dict[str, float]]] = [None] * len(destinations)
+    
+    if mode == "walking" and settings.route_matrix_enabled:
+        # 步行距离对称，用高德距离测量接口一次请求（以各终点为起点、用户为终点）
+        try:
+            matrix = await fetch_distance_matrix(destinations, origin, distance_type=3)
+            for index, entry in matrix.items():
+                if 0 <= index < len(results):
+                    results[index] = entry
+        except Exception as e:
+            print(f"距离测量失败: {e}")
+    
+    # 其余终点（非步行、接口失败或超出步行测距范围）并发逐个规划
+    semaphore = asyncio.Semaphore(settings.route_batch_concurrency)
+    
+    async def plan(index: int) -> None:
+        async with semaphore:
+            route = await get_route(origin, destinations[index], mode)
+        if route:
+            results[index] = {"distance": route["distance"], "duration": route["duration"]}
+    
+    await asyncio.gather(*(plan(index) for index, entry in enumerate(results) if entry is None))
+    return results
+
+
+async def fetch_distance_matrix(
+    origins: List[Dict[str, float]],
+    destination: Dict[str, float],
+    distance_type: int = 3
+) -> Dict[int, Dict[str, float]]:
+    """调用高德距离测量（多起点到一个终点），返回 {起点下标: {distance, duration}}
+
+    distance_type: 0 直线距离，1 驾车导航距离，3 步行规划距离（仅支持 5 公里以内）
+    """
+    data = await amap_get(
+        "distance",
+        {
+            "origins": "|".join(f"{o['lng']},{o['lat']}" for o in origins),
+            "destination": f"{destination['lng']},{destination['lat']}",
+            "type": distance_type
+        },
+        PRIORITY_ROUTE
+    )
+    if data.get("status") != "1":
+        raise RuntimeError(f"高德距离测量错误: {data.get('info')}")
+    
+    results = {}
+    for item in data.get("results") or []:
+        # 单条结果出错时带有 code 字段
+        if item.get("code") or not item.get("distance"):
+            continue
+        results[int(item.get("origin_id", 0)) - 1] = {
+            "distance": float(item["distance"]),
+            "duration": float(item.get("duration") or 0) / 60  # 转为分钟
+        }
+    return results
+
+
 def parse_steps(steps: List[Dict]) -> List[Dict[str, Any]]:
     """解析路线步骤"""
     result = []
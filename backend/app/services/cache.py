@@ -0,0 +1,142 @@
+"""内存缓存 - TTL + LRU"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """带过期时间和容量上限的 LRU 缓存
+
+    条目过期后在 stale_ttl 时间内仍保留，可通过 get_entry 作为陈旧数据读取，
+    用于上游故障时兜底或先返回旧数据再后台刷新。
+    """
+
+    def __init__(self, max_entries: int, ttl: float, stale_ttl: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，过期或不存在时返回 None"""
+        entry = self.get_entry(key)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0]
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """读取缓存条目，返回 (值, 是否新鲜)；超出陈旧期或不存在时返回 None"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, stale_until = entry
+        now = time.monotonic()
+        if stale_until <= now:
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        if expires_at <= now:
+            self.stale_hits += 1
+            return value, False
+
+        self.hits += 1
+        return value, True
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at, expires_at + self.stale_ttl)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+
+    def dump(self) -> list:
+        """导出未过期条目 [(键, 值, 剩余秒数)]，按最近使用顺序排列"""
+        now = time.monotonic()
+        return [
+            (key, value, expires_at - now)
+            for key, (value, expires_at, _) in self._data.items()
+            if expires_at > now
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class BackgroundRefresher:
+    """后台刷新任务，同一个 key 同时只刷新一次"""
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def schedule(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> None:
+        """启动后台刷新，已有进行中的同 key 刷新时忽略"""
+        if key in self._tasks:
+            return
+
+        task = asyncio.ensure_future(factory())
+        self._tasks[key] = task
+
+        def done(finished: asyncio.Task) -> None:
+            self._tasks.pop(key, None)
+            if not finished.cancelled() and finished.exception() is not None:
+                print(f"后台刷新失败: {finished.exception()}")
+
+        task.add_done_callback(done)
+
+
+def save_cache(cache: TTLCache, path: str) -> None:
+    """把缓存持久化到 JSON 文件（键须为字符串元组）"""
+    payload = {
+        "saved_at": time.time(),
+        "entries": [[list(key), value, ttl] for key, value, ttl in cache.dump()]
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_cache(cache: TTLCache, path: str) -> int:
+    """从 JSON 文件恢复缓存，扣除文件保存以来经过的时间，返回恢复的条目数"""
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+
+    elapsed = max(time.time() - payload.get("saved_at", 0), 0)
+    count = 0
+    for key, value, ttl in payload.get("entries", []):
+        remaining = ttl - elapsed
+        if remaining > 0:
+            cache.set(tuple(key), value, ttl=remaining)
+            count += 1
+    return count
@@ -0,0 +1,114 @@
+"""熔断器 - 上游持续失败或变慢时快速失败"""
+import time
+from collections import deque
+from typing import Deque, Dict
+from app.config import get_settings
+
+settings = get_settings()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开，调用未发出"""
+
+
+class CircuitBreaker:
+    """按最近调用的失败率熔断
+
+    失败（异常或超过 slow_call_seconds 的慢调用）比例超过 failure_rate 时打开，
+    open_seconds 后进入半开状态，放行少量探测请求：探测成功则关闭，失败则重新打开。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_seconds: float,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1
+    ):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True 表示失败
+        self._probes = 0
+
+    def allow(self) -> bool:
+        """是否允许发起调用"""
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self.opened_at = now
+            self._probes = 0
+
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                if now - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                # 探测请求迟迟没有结果（如被取消），允许重新探测
+                self.opened_at = now
+                self._probes = 0
+            self._probes += 1
+
+        return True
+
+    def is_open(self) -> bool:
+        """是否处于熔断期（不改变状态）"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.open_seconds
+
+    def record(self, success: bool, duration: float) -> None:
+        """记录一次调用结果"""
+        failed = not success or duration > self.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            if failed:
+                self._open()
+            else:
+                self.state = CLOSED
+                self._outcomes.clear()
+            return
+
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and \
+                sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._outcomes.clear()
+        print(f"熔断器打开: {self.name}")
+
+
+def _build_breakers() -> Dict[str, CircuitBreaker]:
+    """每个上游一个熔断器"""
+    common = {
+        "failure_rate": settings.breaker_failure_rate,
+        "window": settings.breaker_window,
+        "min_calls": settings.breaker_min_calls,
+        "open_seconds": settings.breaker_open_seconds,
+    }
+    return {
+        "amap": CircuitBreaker("amap", settings.amap_slow_call_seconds, **common),
+        "siliconflow": CircuitBreaker("siliconflow", settings.llm_slow_call_seconds, **common),
+        "dashscope": CircuitBreaker("dashscope", settings.llm_slow_call_seconds, **common),
+        "openai": CircuitBreaker("openai", settings.llm_slow_call_seconds, **common),
+    }
+
+
+breakers = _build_breakers()
@@ -0,0 +1,252 @@
+"""地理计算工具"""
+import math
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 未安装 NumPy 时使用纯 Python 实现
+    np = None
+
+EARTH_RADIUS = 6371000  # 地球半径（米）
+METERS_PER_DEGREE = 111320.0  # 每度纬度约合米数
+
+# 距离计算方式
+# haversine: 球面距离
+# equirectangular: 等距矩形投影近似，纬度 70° 以内、距离 50km 以内相对误差小于 3e-5
+#                  （50km 处约 1.5m），适合城市范围内的排序和过滤
+HAVERSINE = "haversine"
+EQUIRECTANGULAR = "equirectangular"
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 7) -> str:
+    """计算 geohash 编码"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """返回 geohash 网格的 (最小纬度, 最大纬度, 最小经度, 最大经度)"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        index = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (index >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    """返回 geohash 网格中心 (纬度, 经度)"""
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    return (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+
+
+def geohash_cell_radius(geohash: str) -> float:
+    """网格中心到角点的距离（米），用于扩大按网格查询的半径"""
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    center_lat, center_lng = geohash_center(geohash)
+    return haversine(center_lat, center_lng, lat_max, lng_max)
+
+
+def geohash_cover_box(
+    lat_min: float,
+    lat_max: float,
+    lng_min: float,
+    lng_max: float,
+    precision: int
+) -> List[str]:
+    """与矩形相交的全部 geohash 网格"""
+    cell_lat_min, cell_lat_max, cell_lng_min, cell_lng_max = geohash_bounds(geohash_encode(lat_min, lng_min, precision))
+    step_lat = (cell_lat_max - cell_lat_min) * 0.999
+    step_lng = (cell_lng_max - cell_lng_min) * 0.999
+
+    cells = []
+    seen = set()
+    row = lat_min
+    while True:
+        col = lng_min
+        while True:
+            cell = geohash_encode(min(row, lat_max), min(col, lng_max), precision)
+            if cell not in seen:
+                seen.add(cell)
+                cells.append(cell)
+            if col >= lng_max:
+                break
+            col += step_lng
+        if row >= lat_max:
+            break
+        row += step_lat
+    return cells
+
+
+def geohash_cells_within(
+    lat_min: float,
+    lat_max: float,
+    lng_min: float,
+    lng_max: float,
+    precision: int
+) -> List[str]:
+    """完全落在矩形内的 geohash 网格"""
+    cells = []
+    for cell in geohash_cover_box(lat_min, lat_max, lng_min, lng_max, precision):
+        c_lat_min, c_lat_max, c_lng_min, c_lng_max = geohash_bounds(cell)
+        if c_lat_min >= lat_min and c_lat_max <= lat_max and c_lng_min >= lng_min and c_lng_max <= lng_max:
+            cells.append(cell)
+    return cells
+
+
+def bounding_box(lat: float, lng: float, radius: float) -> Tuple[float, float, float, float]:
+    """以某点为圆心、radius 米为半径的外接矩形 (最小纬度, 最大纬度, 最小经度, 最大经度)"""
+    dlat = radius / METERS_PER_DEGREE
+    dlng = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """计算两点间距离（米）- Haversine 公式"""
+    R = EARTH_RADIUS
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lng2 - lng1)
+
+    a = math.sin(delta_phi / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return R * c
+
+
+def equirectangular(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """计算两点间近似距离（米）- 等距矩形投影"""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS * math.hypot(x, y)
+
+
+def distances_one_to_many(
+    lat: float,
+    lng: float,
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    method: str = HAVERSINE
+) -> Sequence[float]:
+    """计算一个点到多个点的距离（米）
+
+    安装 NumPy 时返回 ndarray，否则返回 list。
+    """
+    if np is not None:
+        return _np_distances(
+            np.float64(lat), np.float64(lng),
+            np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64),
+            method
+        )
+
+    func = equirectangular if method == EQUIRECTANGULAR else haversine
+    return [func(lat, lng, p_lat, p_lng) for p_lat, p_lng in zip(lats, lngs)]
+
+
+def distances_many_to_many(
+    lats1: Sequence[float],
+    lngs1: Sequence[float],
+    lats2: Sequence[float],
+    lngs2: Sequence[float],
+    method: str = HAVERSINE
+) -> Sequence[Sequence[float]]:
+    """计算距离矩阵（米），第 i 行为第一组第 i 个点到第二组各点的距离
+
+    安装 NumPy 时返回形状为 (n, m) 的 ndarray，否则返回嵌套 list。
+    """
+    if np is not None:
+        lats1 = np.asarray(lats1, dtype=np.float64)[:, None]
+        lngs1 = np.asarray(lngs1, dtype=np.float64)[:, None]
+        lats2 = np.asarray(lats2, dtype=np.float64)[None, :]
+        lngs2 = np.asarray(lngs2, dtype=np.float64)[None, :]
+        return _np_distances(lats1, lngs1, lats2, lngs2, method)
+
+    return [
+        distances_one_to_many(lat, lng, lats2, lngs2, method)
+        for lat, lng in zip(lats1, lngs1)
+    ]
+
+
+def nearest_indices(
+    lats1: Sequence[float],
+    lngs1: Sequence[float],
+    lats2: Sequence[float],
+    lngs2: Sequence[float],
+    method: str = HAVERSINE
+) -> Tuple[List[int], List[float]]:
+    """对第一组每个点，返回第二组中最近点的下标和距离"""
+    if len(lats1) == 0 or len(lats2) == 0:
+        return [], []
+
+    matrix = distances_many_to_many(lats1, lngs1, lats2, lngs2, method)
+    if np is not None:
+        indices = matrix.argmin(axis=1)
+        distances = matrix[np.arange(len(indices)), indices]
+        return indices.tolist(), distances.tolist()
+
+    indices = []
+    distances = []
+    for row in matrix:
+        index = min(range(len(row)), key=row.__getitem__)
+        indices.append(index)
+        distances.append(row[index])
+    return indices, distances
+
+
+def to_list(values: Sequence[float]) -> List[float]:
+    """把批量计算结果转为 Python 列表"""
+    return values if isinstance(values, list) else values.tolist()
+
+
+def _np_distances(lat1, lng1, lat2, lng2, method: str):
+    """NumPy 广播计算距离"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_lambda = np.radians(lng2 - lng1)
+
+    if method == EQUIRECTANGULAR:
+        x = delta_lambda * np.cos((phi1 + phi2) / 2)
+        y = phi2 - phi1
+        return EARTH_RADIUS * np.hypot(x, y)
+
+    a = np.sin((phi2 - phi1) / 2) ** 2 + \
+        np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
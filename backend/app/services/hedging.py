@@ -0,0 +1,87 @@
+"""对冲请求 - 多个上游竞速，取最先成功的结果"""
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+
+class LatencyTracker:
+    """记录各上游最近若干次成功调用的耗时，用于计算对冲延迟"""
+
+    def __init__(self, window: int = 100):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        """记录一次成功调用的耗时"""
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, name: str, q: float, min_samples: int = 10) -> Optional[float]:
+        """耗时分位数，样本不足时返回 None"""
+        samples = self._samples.get(name)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def hedged_race(
+    calls: List[Tuple[str, Callable[[], Awaitable[Any]]]],
+    hedge_delay: Callable[[str], float],
+    deadline: float,
+    on_success: Optional[Callable[[str, float], None]] = None
+) -> Tuple[str, Any]:
+    """按顺序启动调用：前一个超过对冲延迟仍未返回、或已失败时启动下一个
+
+    返回最先成功的 (名称, 结果) 并取消其余调用；
+    全部失败时抛出最后一个异常，超过 deadline 秒时抛出 asyncio.TimeoutError。
+    """
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    end_at = started_at + deadline
+    tasks: Dict[asyncio.Task, Tuple[str, float]] = {}
+    next_index = 0
+    next_launch_at = started_at
+    last_error: Optional[BaseException] = None
+
+    def launch() -> None:
+        nonlocal next_index, next_launch_at
+        name, factory = calls[next_index]
+        now = loop.time()
+        tasks[asyncio.ensure_future(factory())] = (name, now)
+        next_index += 1
+        next_launch_at = now + hedge_delay(name)
+
+    try:
+        launch()
+        while True:
+            now = loop.time()
+            if now >= end_at:
+                raise asyncio.TimeoutError()
+
+            wait_until = end_at
+            if next_index < len(calls):
+                wait_until = min(wait_until, next_launch_at)
+
+            done, _ = await asyncio.wait(
+                tasks.keys(), timeout=max(wait_until - now, 0), return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                name, task_started_at = tasks.pop(task)
+                if task.exception() is None:
+                    if on_success is not None:
+                        on_success(name, loop.time() - task_started_at)
+                    return name, task.result()
+                last_error = task.exception()
+
+            if next_index < len(calls) and (not tasks or loop.time() >= next_launch_at):
+                # 有调用失败或到达对冲时间，启动下一个
+                launch()
+            elif not tasks:
+                raise last_error
+    finally:
+        for task in tasks:
+            task.cancel()
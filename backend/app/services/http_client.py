@@ -0,0 +1,78 @@
+"""共享 HTTP 客户端 - 由应用生命周期管理的连接池"""
+import importlib.util
+from typing import Dict
+import httpx
+from app.config import get_settings
+
+settings = get_settings()
+
+
+# 上游名称 -> 超时配置项
+UPSTREAM_TIMEOUTS = {
+    "amap": "amap_timeout",
+    "siliconflow": "siliconflow_timeout",
+    "dashscope": "dashscope_timeout",
+    "openai": "openai_timeout",
+    "otlp": "trace_export_timeout",
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_openai_client = None
+
+
+def http2_available() -> bool:
+    """是否启用 HTTP/2（需要安装 h2）"""
+    return settings.http2_enabled and importlib.util.find_spec("h2") is not None
+
+
+def _build_client(upstream: str) -> httpx.AsyncClient:
+    """按上游配置创建带连接池的客户端"""
+    timeout = getattr(settings, UPSTREAM_TIMEOUTS[upstream])
+    return httpx.AsyncClient(
+        http2=http2_available(),
+        timeout=httpx.Timeout(timeout, connect=min(timeout, settings.http_connect_timeout)),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+    )
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    """获取指定上游的共享客户端（未初始化时按需创建）"""
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _build_client(upstream)
+        _clients[upstream] = client
+    return client
+
+
+def get_openai_client():
+    """获取共享的 OpenAI 客户端，复用 openai 上游的连接池"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url or None,
+            timeout=settings.openai_timeout,
+            http_client=get_client("openai"),
+        )
+    return _openai_client
+
+
+def init_clients() -> None:
+    """应用启动时预建所有上游客户端"""
+    for upstream in UPSTREAM_TIMEOUTS:
+        get_client(upstream)
+
+
+async def close_clients() -> None:
+    """应用关闭时释放连接池"""
+    global _openai_client
+    for client in _clients.values():
+        if not client.is_closed:
+            await client.aclose()
+    _clients.clear()
+    _openai_client = None
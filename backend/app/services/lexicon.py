@@ -0,0 +1,226 @@
+"""规则引擎词典 - 预编译的多模式匹配"""
+import json
+import os
+import re
+import unicodedata
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.config import get_settings
+from app.services.text_normalize import canonicalize_text
+
+settings = get_settings()
+
+
+# 知名品牌库
+BRAND_DATABASE = {
+    "酒店": ["如家", "汉庭", "7天", "锦江之星", "格林豪泰", "维也纳", "全季", "桔子"],
+    "咖啡": ["星巴克", "瑞幸", "Costa", "太平洋咖啡", "Manner", "Tims"],
+    "便利店": ["7-11", "全家", "罗森", "便利蜂", "美宜佳"],
+    "快餐": ["麦当劳", "肯德基", "汉堡王", "德克士", "必胜客"],
+}
+
+# 品牌分组 -> 地点类型
+BRAND_CATEGORIES = {
+    "酒店": "酒店",
+    "咖啡": "咖啡厅",
+    "便利店": "便利店",
+    "快餐": "餐饮",
+}
+
+# 地点类型 -> (同义词, 优先级)，多个类型同时出现时优先级数值小的胜出
+CATEGORY_SYNONYMS = {
+    "酒店": (["酒店", "宾馆"], 10),
+    "咖啡厅": (["咖啡", "星巴克"], 20),
+    "便利店": (["便利店"], 30),
+    "地铁站": (["地铁"], 40),
+    "药店": (["药店", "药房"], 45),
+    "医院": (["医院"], 45),
+    "银行": (["银行"], 45),
+    "超市": (["超市"], 45),
+    "商场": (["商场", "购物"], 50),
+}
+
+# 只命中品牌时推断类型所用的优先级：高于 "地铁"，低于明确的类型词
+BRAND_CATEGORY_PRIORITY = 35
+
+# 子类型触发词：(类型, 触发词, 子类型)
+SUBCATEGORY_RULES = [
+    ("酒店", ["经济型", "快捷"], "经济型酒店"),
+]
+
+# 距离和数量：数字 + 单位，一次扫描
+_QUANTITY_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(公里|千米|km|米|m(?![a-z])|个|家)")
+_KILOMETER_UNITS = {"公里", "千米", "km"}
+_METER_UNITS = {"米", "m"}
+
+
+class AhoCorasick:
+    """Aho-Corasick 自动机，一次扫描找出文本中所有词条"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Any]] = [[]]
+
+    def add(self, word: str, payload: Any) -> None:
+        """添加词条，命中时返回 payload"""
+        node = 0
+        for char in word:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(payload)
+
+    def build(self) -> None:
+        """构建失败指针"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text: str) -> Iterator[Tuple[int, Any]]:
+        """遍历所有命中，返回 (结束位置, payload)"""
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for payload in self._output[node]:
+                yield index, payload
+
+
+def fold_word(word: str) -> str:
+    """词条与查询文本使用相同的规范化"""
+    return unicodedata.normalize("NFKC", word).lower()
+
+
+class Lexicon:
+    """规则引擎词典"""
+
+    def __init__(
+        self,
+        categories: Dict[str, Tuple[List[str], int]],
+        brands: Dict[str, List[str]],
+        brand_categories: Dict[str, str],
+        subcategory_rules: List[Tuple[str, List[str], str]]
+    ):
+        # 品牌表：按名称长度降序，下标即品牌编号，POI 名称中出现多个品牌时取最长的
+        unique = dict.fromkeys(brand for names in brands.values() for brand in names)
+        self.brands: List[str] = sorted(unique, key=len, reverse=True)
+        brand_ids = {brand: index for index, brand in enumerate(self.brands)}
+
+        self.automaton = AhoCorasick()
+        for category, (words, priority) in categories.items():
+            for word in words:
+                self.automaton.add(fold_word(word), ("category", category, priority))
+        for group, names in brands.items():
+            for brand in names:
+                self.automaton.add(fold_word(brand), ("brand", brand, brand_categories.get(group), brand_ids[brand]))
+        for category, words, subcategory in subcategory_rules:
+            for word in words:
+                self.automaton.add(fold_word(word), ("subcategory", category, subcategory))
+        self.automaton.add("地铁", ("subway",))
+        self.automaton.add("近", ("near",))
+        self.automaton.build()
+
+    def brand_id(self, name: str) -> int:
+        """POI 名称中出现的品牌编号（最长的品牌优先），没有时为 -1；一次扫描"""
+        best = -1
+        for _, payload in self.automaton.search(fold_word(name)):
+            if payload[0] == "brand" and (best < 0 or payload[3] < best):
+                best = payload[3]
+        return best
+
+    def extract(self, message: str) -> Dict[str, Any]:
+        """一次扫描提取类型、品牌、半径、数量和邻近条件"""
+        text = canonicalize_text(message)
+
+        category: Optional[str] = None
+        category_priority = float("inf")
+        brand_category: Optional[str] = None
+        brands: List[str] = []
+        subcategories: Dict[str, str] = {}
+        has_subway = False
+        has_near = False
+
+        for _, payload in self.automaton.search(text):
+            kind = payload[0]
+            if kind == "category":
+                if payload[2] < category_priority:
+                    category, category_priority = payload[1], payload[2]
+            elif kind == "brand":
+                if payload[1] not in brands:
+                    brands.append(payload[1])
+                if brand_category is None:
+                    brand_category = payload[2]
+            elif kind == "subcategory":
+                subcategories.setdefault(payload[1], payload[2])
+            elif kind == "subway":
+                has_subway = True
+            elif kind == "near":
+                has_near = True
+
+        if brand_category and category_priority > BRAND_CATEGORY_PRIORITY:
+            category = brand_category
+
+        radius = None
+        limit = None
+        for match in _QUANTITY_PATTERN.finditer(text):
+            value, unit = float(match.group(1)), match.group(2)
+            if radius is None and unit in _KILOMETER_UNITS:
+                radius = int(value * 1000)
+            elif radius is None and unit in _METER_UNITS:
+                radius = int(value)
+            elif limit is None and unit in ("个", "家"):
+                limit = int(value)
+
+        return {
+            "category": category,
+            "subcategory": subcategories.get(category) if category else None,
+            "brands": brands or None,
+            "radius": radius,
+            "limit": limit,
+            "near_subway": has_subway and has_near,
+        }
+
+
+def load_lexicon(path: str = "") -> Lexicon:
+    """构建词典，可从 JSON 文件扩展类型同义词和品牌
+
+    文件格式：
+    {
+      "categories": {"药店": {"words": ["药房", "大药房"], "priority": 45}},
+      "brands": {"酒店": ["亚朵", "希尔顿欢朋"]},
+      "brand_categories": {"奶茶": "餐饮"}
+    }
+    """
+    categories = {name: (list(words), priority) for name, (words, priority) in CATEGORY_SYNONYMS.items()}
+    brands = {group: list(names) for group, names in BRAND_DATABASE.items()}
+    brand_categories = dict(BRAND_CATEGORIES)
+
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for name, entry in data.get("categories", {}).items():
+            words, priority = categories.get(name, ([], 45))
+            categories[name] = (words + entry.get("words", []), entry.get("priority", priority))
+        for group, names in data.get("brands", {}).items():
+            brands.setdefault(group, []).extend(names)
+        brand_categories.update(data.get("brand_categories", {}))
+
+    return Lexicon(categories, brands, brand_categories, SUBCATEGORY_RULES)
+
+
+# 模块导入时构建一次
+lexicon = load_lexicon(settings.lexicon_file)
@@ -1,19 +1,38 @@
 """LLM 服务 - 自然语言解析"""
+import asyncio
 import json
-import httpx
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List
 from app.config import get_settings
+from app.services.cache import BackgroundRefresher, save_cache, load_cache
+from app.services.circuit_breaker import breakers, CircuitOpenError
+from app.services.hedging import LatencyTracker, hedged_race
+from app.services.http_client import get_client, get_openai_client
+from app.services.lexicon import lexicon
+from app.services.metrics import llm_fallbacks, upstream_requests, upstream_duration
+from app.services.tracing import span
+from app.services.shared_cache import SharedCache
+from app.services.singleflight import SingleFlight
+from app.services.text_normalize import normalize_query_key
 
 settings = get_settings()
 
+# 解析结果缓存：(服务商, 规范化查询) -> 解析结果
+parse_cache = SharedCache(
+    "parse",
+    max_entries=settings.parse_cache_max_entries,
+    ttl=settings.parse_cache_ttl,
+    stale_ttl=settings.parse_cache_stale_ttl
+)
 
-# 知名品牌库
-BRAND_DATABASE = {
-    "酒店": ["如家", "汉庭", "7天", "锦江之星", "格林豪泰", "维也纳", "全季", "桔子"],
-    "咖啡": ["星巴克", "瑞幸", "Costa", "太平洋咖啡", "Manner", "Tims"],
-    "便利店": ["7-11", "全家", "罗森", "便利蜂", "美宜佳"],
-    "快餐": ["麦当劳", "肯德基", "汉堡王", "德克士", "必胜客"],
-}
+# 陈旧解析结果的后台刷新
+refresher = BackgroundRefresher()
+
+# 各服务商成功调用的耗时
+latency_tracker = LatencyTracker()
+
+# 合并并发的相同解析请求
+llm_flight = SingleFlight()
 
 
 async def parse_query_with_llm(message: str, location: Dict[str, float]) -> Dict[str, Any]:
@@ -50,180 +69,281 @@ async def parse_query_with_llm(message: str, location: Dict[str, float]) -> Dict
 
     user_message = f"用户查询：{message}\n用户位置：纬度{location['lat']}, 经度{location['lng']}"
 
-    # 优先使用 SiliconFlow (DeepSeek)
-    if settings.siliconflow_api_key:
-        return await parse_with_siliconflow(system_prompt, user_message)
-    # 其次使用通义千问
-    elif settings.dashscope_api_key:
-        return await parse_with_dashscope(system_prompt, user_message)
-    elif settings.openai_api_key:
-        return await parse_with_openai(system_prompt, user_message)
-    else:
+    providers = select_providers()
+    if not providers:
         # 降级到规则引擎
+        _fallbacks["no_provider"].inc()
+        return parse_with_rules(message)
+    
+    # 相同（规范化后）的查询直接复用解析结果
+    query_key = normalize_query_key(message)
+    stale = None
+    for provider in providers:
+        entry = await parse_cache.lookup((provider, query_key))
+        if entry is not None:
+            cached, fresh = entry
+            if fresh:
+                return dict(cached)
+            stale = stale or cached
+    
+    # 跳过熔断中的服务商
+    providers = [provider for provider in providers if not breakers[provider].is_open()]
+    if stale is not None:
+        # 先返回陈旧结果，后台刷新
+        if providers:
+            refresher.schedule(
+                ("parse", query_key),
+                lambda: race_providers(providers, query_key, system_prompt, user_message)
+            )
+        return dict(stale)
+    if not providers:
+        print("LLM 服务商均在熔断中，使用规则引擎")
+        _fallbacks["circuit_open"].inc()
+        return parse_with_rules(message)
+    
+    try:
+        parsed = await race_providers(providers, query_key, system_prompt, user_message)
+    except asyncio.TimeoutError:
+        print(f"LLM 解析超时（{settings.llm_deadline}秒），使用规则引擎")
+        _fallbacks["timeout"].inc()
+        return parse_with_rules(message)
+    except Exception as e:
+        print(f"LLM 解析失败: {e}")
+        _fallbacks["error"].inc()
         return parse_with_rules(message)
+    
+    return dict(parsed)
 
 
-async def parse_with_siliconflow(system_prompt: str, user_message: str) -> Dict[str, Any]:
-    """使用 SiliconFlow (DeepSeek-R1) 解析"""
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.siliconflow.cn/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.siliconflow_api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 1000
-                }
-            )
+async def race_providers(
+    providers: List[str],
+    query_key: str,
+    system_prompt: str,
+    user_message: str
+) -> Dict[str, Any]:
+    """调用服务商解析并写入缓存"""
+    # 对冲模式下主服务商超过 p95 延迟仍未返回时启动备选服务商
+    if not settings.llm_hedge_enabled:
+        providers = providers[:1]
+    calls = [
+        (provider, lambda provider=provider: llm_flight.do(
+            (provider, query_key), lambda: call_provider(provider, system_prompt, user_message)
+        ))
+        for provider in providers
+    ]
+    
+    provider, parsed = await hedged_race(
+        calls,
+        hedge_delay=hedge_delay,
+        deadline=settings.llm_deadline,
+        on_success=latency_tracker.record
+    )
+    parse_cache.set((provider, query_key), parsed)
+    return parsed
 
-            if response.status_code == 200:
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                # 提取 JSON
-                # DeepSeek-R1 可能会有思考过程，需要提取 JSON 部分
-                if "```json" in content:
-                    json_str = content.split("```json")[1].split("```")[0].strip()
-                elif "{" in content:
-                    # 提取第一个 JSON 对象
-                    start = content.index("{")
-                    end = content.rindex("}") + 1
-                    json_str = content[start:end]
-                else:
-                    json_str = content
-
-                parsed = json.loads(json_str)
-                return parsed
-            else:
-                print(f"SiliconFlow API 错误: {response.status_code}")
-                return parse_with_rules(user_message)
 
-    except Exception as e:
-        print(f"SiliconFlow 解析失败: {e}")
-        return parse_with_rules(user_message)
+async def call_provider(provider: str, system_prompt: str, user_message: str) -> Dict[str, Any]:
+    """经熔断器调用服务商，记录成功、失败和慢调用"""
+    with span("llm", provider=provider):
+        breaker = breakers[provider]
+        if not breaker.allow():
+            _provider_requests[provider]["circuit_open"].inc()
+            raise CircuitOpenError(f"{provider} 熔断中")
+        
+        started_at = time.monotonic()
+        try:
+            parsed = await PROVIDER_CALLS[provider](system_prompt, user_message)
+        except asyncio.CancelledError:
+            # 对冲落败或超过截止时间被取消，只有已经算慢调用时才记为失败
+            duration = time.monotonic() - started_at
+            if duration > breaker.slow_call_seconds:
+                breaker.record(False, duration)
+            _provider_requests[provider]["cancelled"].inc()
+            raise
+        except Exception:
+            duration = time.monotonic() - started_at
+            breaker.record(False, duration)
+            _provider_requests[provider]["error"].inc()
+            _provider_durations[provider].observe(duration)
+            raise
+        duration = time.monotonic() - started_at
+        breaker.record(True, duration)
+        _provider_requests[provider]["ok"].inc()
+        _provider_durations[provider].observe(duration)
+        return parsed
 
 
-async def parse_with_dashscope(system_prompt: str, user_message: str) -> Dict[str, Any]:
-    """使用通义千问解析"""
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation",
-                headers={
-                    "Authorization": f"Bearer {settings.dashscope_api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "qwen-turbo",
-                    "input": {
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_message}
-                        ]
-                    },
-                    "parameters": {
-                        "result_format": "message"
-                    }
-                }
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result["output"]["choices"][0]["message"]["content"]
-                # 提取 JSON
-                parsed = json.loads(content)
-                return parsed
-            else:
-                return parse_with_rules(user_message)
-                
-    except Exception as e:
-        print(f"LLM 解析失败: {e}")
-        return parse_with_rules(user_message)
+def select_providers() -> List[str]:
+    """按 API Key 配置列出可用的 LLM 服务商（按优先级排序）"""
+    providers = []
+    # 优先使用 SiliconFlow (DeepSeek)
+    if settings.siliconflow_api_key:
+        providers.append("siliconflow")
+    # 其次使用通义千问
+    if settings.dashscope_api_key:
+        providers.append("dashscope")
+    if settings.openai_api_key:
+        providers.append("openai")
+    return providers
 
 
-async def parse_with_openai(system_prompt: str, user_message: str) -> Dict[str, Any]:
-    """使用 OpenAI 解析"""
-    try:
-        from openai import AsyncOpenAI
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+def hedge_delay(provider: str) -> float:
+    """对冲延迟：该服务商近期耗时的分位数，样本不足时使用默认值"""
+    observed = latency_tracker.percentile(provider, settings.llm_hedge_percentile)
+    if observed is None:
+        return settings.llm_hedge_delay
+    return max(observed, settings.llm_hedge_min_delay)
+
+
+def extract_json(content: str) -> Dict[str, Any]:
+    """从模型输出中提取 JSON 对象"""
+    # DeepSeek-R1 可能会有思考过程，需要提取 JSON 部分
+    if "```json" in content:
+        json_str = content.split("```json")[1].split("```")[0].strip()
+    elif "{" in content:
+        # 提取第一个 JSON 对象
+        start = content.index("{")
+        end = content.rindex("}") + 1
+        json_str = content[start:end]
+    else:
+        json_str = content
+
+    parsed = json.loads(json_str)
+    if not isinstance(parsed, dict):
+        raise ValueError("模型输出不是 JSON 对象")
+    return parsed
+
+
+async def call_siliconflow(system_prompt: str, user_message: str) -> Dict[str, Any]:
+    """使用 SiliconFlow (DeepSeek-R1) 解析，失败时抛出异常"""
+    client = get_client("siliconflow")
+    response = await client.post(
+        f"{settings.siliconflow_base_url}/chat/completions",
+        headers={
+            "Authorization": f"Bearer {settings.siliconflow_api_key}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B",
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_message}
             ],
-            temperature=0.3
-        )
-        
-        content = response.choices[0].message.content
-        parsed = json.loads(content)
-        return parsed
-        
-    except Exception as e:
-        print(f"OpenAI 解析失败: {e}")
-        return parse_with_rules(user_message)
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
+    )
+
+    if response.status_code != 200:
+        raise RuntimeError(f"SiliconFlow API 错误: {response.status_code}")
+
+    result = response.json()
+    return extract_json(result["choices"][0]["message"]["content"])
+
+
+async def call_dashscope(system_prompt: str, user_message: str) -> Dict[str, Any]:
+    """使用通义千问解析，失败时抛出异常"""
+    client = get_client("dashscope")
+    response = await client.post(
+        f"{settings.dashscope_base_url}/services/aigc/text-generation/generation",
+        headers={
+            "Authorization": f"Bearer {settings.dashscope_api_key}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": "qwen-turbo",
+            "input": {
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message}
+                ]
+            },
+            "parameters": {
+                "result_format": "message"
+            }
+        }
+    )
+    
+    if response.status_code != 200:
+        raise RuntimeError(f"DashScope API 错误: {response.status_code}")
+
+    result = response.json()
+    return extract_json(result["output"]["choices"][0]["message"]["content"])
+
+
+async def call_openai(system_prompt: str, user_message: str) -> Dict[str, Any]:
+    """使用 OpenAI 解析，失败时抛出异常"""
+    client = get_openai_client()
+    
+    response = await client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        temperature=0.3
+    )
+    
+    return extract_json(response.choices[0].message.content)
+
+
+# 服务商名称 -> 调用函数
+PROVIDER_CALLS = {
+    "siliconflow": call_siliconflow,
+    "dashscope": call_dashscope,
+    "openai": call_openai,
+}
+
+# 指标子项预先绑定，热路径上不再逐次 labels() 查找
+_provider_requests = {
+    provider: {
+        outcome: upstream_requests.labels(provider, "chat", outcome)
+        for outcome in ("ok", "error", "cancelled", "circuit_open")
+    }
+    for provider in PROVIDER_CALLS
+}
+_provider_durations = {provider: upstream_duration.labels(provider, "chat") for provider in PROVIDER_CALLS}
+_fallbacks = {
+    reason: llm_fallbacks.labels(reason)
+    for reason in ("no_provider", "circuit_open", "timeout", "error")
+}
 
 
 def parse_with_rules(message: str) -> Dict[str, Any]:
     """规则引擎解析（降级方案）"""
+    extracted = lexicon.extract(message)
     result = {
-        "category": "餐饮",
-        "subcategory": None,
-        "radius": 5000,
-        "limit": 10,
+        "category": extracted["category"] or "餐饮",
+        "subcategory": extracted["subcategory"],
+        "radius": extracted["radius"] or 5000,
+        "limit": min(extracted["limit"], 20) if extracted["limit"] else 10,
         "sort_by": None,
-        "brands": None,
+        "brands": extracted["brands"],
         "proximity": None
     }
     
-    # 提取类型
-    if "酒店" in message or "宾馆" in message:
-        result["category"] = "酒店"
-        if "经济型" in message or "快捷" in message:
-            result["subcategory"] = "经济型酒店"
-    elif "咖啡" in message or "星巴克" in message:
-        result["category"] = "咖啡厅"
-    elif "便利店" in message:
-        result["category"] = "便利店"
-    elif "地铁" in message:
-        result["category"] = "地铁站"
-    elif "商场" in message or "购物" in message:
-        result["category"] = "商场"
-    
-    # 提取距离
-    import re
-    distance_match = re.search(r'(\d+)\s*(公里|km|千米)', message)
-    if distance_match:
-        result["radius"] = int(distance_match.group(1)) * 1000
-    
-    meter_match = re.search(r'(\d+)\s*(米|m)', message)
-    if meter_match:
-        result["radius"] = int(meter_match.group(1))
-    
-    # 提取数量
-    count_match = re.search(r'(\d+)\s*个', message)
-    if count_match:
-        result["limit"] = min(int(count_match.group(1)), 20)
-    
-    # 提取品牌
-    for category, brands in BRAND_DATABASE.items():
-        for brand in brands:
-            if brand in message:
-                result["brands"] = [brand]
-                break
-    
     # 提取排序
-    if "地铁" in message and ("最近" in message or "近" in message):
+    if extracted["near_subway"]:
         result["sort_by"] = "距离地铁站最近"
         result["proximity"] = "地铁站"
     
     return result
 
+
+def load_parse_cache() -> None:
+    """启动时从磁盘恢复解析缓存"""
+    if settings.parse_cache_file:
+        try:
+            count = load_cache(parse_cache, settings.parse_cache_file)
+            print(f"解析缓存已恢复: {count} 条")
+        except Exception as e:
+            print(f"解析缓存恢复失败: {e}")
+
+
+def save_parse_cache() -> None:
+    """关闭时把解析缓存写入磁盘"""
+    if settings.parse_cache_file:
+        try:
+            save_cache(parse_cache, settings.parse_cache_file)
+        except Exception as e:
+            print(f"解析缓存保存失败: {e}")
@@ -0,0 +1,101 @@
+"""候选 POI 记录 - 从解析到排序全程使用的紧凑结构，只在响应时转换为接口格式
+
+Poi 使用 __slots__，坐标直接存为浮点数（没有嵌套的 location 字典），解析时即算好用于展示的品牌编号，
+评分和人均消费取自高德 biz_ext（本地库和快照中的 POI 没有这两项）。
+缓存中保存不可变的行元组（PoiRow），每个请求从行构造自己的 Poi，排序时修改距离和地铁信息
+不会影响缓存。
+"""
+import zlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.services.lexicon import lexicon
+
+# 品牌表与规则引擎词典共用（含 LEXICON_FILE 扩展的品牌），按名称长度降序，名称中出现多个品牌时取最长的
+BRANDS = lexicon.brands
+BRAND_IDS = {brand: index for index, brand in enumerate(BRANDS)}
+# 品牌表指纹：缓存的行中保存品牌编号，词典变化后旧行不再命中
+BRAND_TABLE_VERSION = f"{zlib.crc32('|'.join(BRANDS).encode('utf-8')):08x}"
+
+# 缓存使用的行：(id, 名称, 纬度, 经度, 地址, 电话, 品牌编号, 评分, 人均消费)
+PoiRow = Tuple[str, str, float, float, str, str, int, Optional[float], Optional[float]]
+
+
+@lru_cache(maxsize=65536)
+def brand_of(name: str) -> int:
+    """名称中出现的品牌编号（多个品牌时取最长的，用于展示和知名品牌评分），没有时为 -1
+
+    用词典的 Aho-Corasick 自动机一次扫描；本地库每次查询都会为同一批名称取品牌，按名称缓存结果。
+    名称可能同时包含多个品牌（如 "汉庭酒店(维也纳酒店旁)"），按品牌筛选不能只看这一个编号，见 brand_matcher。
+    """
+    return lexicon.brand_id(name)
+
+
+class Poi:
+    """候选 POI"""
+
+    __slots__ = (
+        "id", "name", "lat", "lng", "address", "phone", "brand", "rating", "cost", "category", "distance", "subway"
+    )
+
+    def __init__(
+        self,
+        poi_id: str,
+        name: str,
+        lat: float,
+        lng: float,
+        address: str = "",
+        phone: str = "",
+        brand: Optional[int] = None,
+        rating: Optional[float] = None,
+        cost: Optional[float] = None,
+        category: Optional[str] = None,
+        distance: float = 0.0,
+        subway: Optional[Dict[str, Any]] = None
+    ):
+        self.id = poi_id
+        self.name = name
+        self.lat = lat
+        self.lng = lng
+        self.address = address
+        self.phone = phone
+        self.brand = brand_of(name) if brand is None else brand
+        self.rating = rating
+        self.cost = cost
+        self.category = category
+        self.distance = distance
+        self.subway = subway
+
+    @classmethod
+    def from_row(cls, row: PoiRow, category: Optional[str] = None, distance: float = 0.0) -> "Poi":
+        return cls(*row, category=category, distance=distance)
+
+    def to_row(self) -> PoiRow:
+        return (self.id, self.name, self.lat, self.lng, self.address, self.phone, self.brand, self.rating, self.cost)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为接口格式（POIResult）"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "category": self.category,
+            "brand": BRANDS[self.brand] if self.brand >= 0 else None,
+            "location": {"lat": self.lat, "lng": self.lng},
+            "address": self.address,
+            "phone": self.phone,
+            "rating": self.rating,
+            "cost": self.cost,
+            "distance": self.distance,
+            "nearest_subway": self.subway,
+        }
+
+    def __repr__(self) -> str:
+        return f"Poi({self.id!r}, {self.name!r}, {self.lat}, {self.lng})"
+
+
+def to_dicts(pois: Iterable[Poi]) -> List[Dict[str, Any]]:
+    return [poi.to_dict() for poi in pois]
+
+
+def brand_matcher(brands: List[str]) -> Callable[[Poi], bool]:
+    """按品牌筛选 POI：名称包含任一品牌即匹配（与本地库的 instr 筛选一致）"""
+    return lambda poi: any(brand in poi.name for brand in brands)
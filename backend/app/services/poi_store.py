@@ -0,0 +1,427 @@
+"""本地 POI 库 - SQLite R-tree 空间索引 + 按网格记录新鲜度
+
+搜索过的 POI 和批量导入的城市数据都写入本地库。按 (geohash 网格, 类型) 记录是否完整拉取过
+以及拉取时间：查询圆覆盖的网格都完整且未过期时直接从本地库返回，否则回退到高德，
+并把缺失或过期的网格登记为待刷新，由后台任务以低优先级按网格增量拉取。
+
+    python -m app.services.poi_store import dump.jsonl --type 100000 --complete
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.config import get_settings
+from app.services.amap_service import fetch_polygon_pois, parse_pois
+from app.services.cache import TTLCache
+from app.services.poi import Poi
+from app.services.geo import (
+    bounding_box, geohash_bounds, geohash_cover_box, geohash_cells_within, distances_one_to_many, to_list
+)
+
+settings = get_settings()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pois (
+    rowid INTEGER PRIMARY KEY,
+    poi_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    address TEXT,
+    phone TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS poi_rtree USING rtree(rowid, min_lat, max_lat, min_lng, max_lng);
+CREATE TABLE IF NOT EXISTS poi_types (
+    type_code TEXT NOT NULL,
+    poi_rowid INTEGER NOT NULL,
+    PRIMARY KEY (type_code, poi_rowid)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cells (
+    cell TEXT NOT NULL,
+    type_code TEXT NOT NULL,
+    fetched_at REAL NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (cell, type_code)
+) WITHOUT ROWID;
+"""
+
+# SQLite 单条语句的参数上限
+_MAX_PARAMS = 900
+
+
+def _chunks(items: List[Any], size: int = _MAX_PARAMS) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class PoiStore:
+    """SQLite POI 库
+
+    所有数据库操作在一个专用线程中串行执行，异步方法不阻塞事件循环。
+    """
+
+    def __init__(self, path: str, precision: int = 6):
+        self.path = path
+        self.precision = precision
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="poi-store")
+        self._conn = self._executor.submit(self._connect).result()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self._executor.submit(self._conn.close).result()
+        self._executor.shutdown()
+
+    # ---- 写入 ----
+
+    def upsert_pois(self, pois: List[Poi], type_code: str) -> int:
+        """写入或更新 POI 并登记类型（同步）"""
+        now = time.time()
+        with self._conn:
+            for poi in pois:
+                self._conn.execute(
+                    "INSERT INTO pois (poi_id, name, lat, lng, address, phone, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(poi_id) DO UPDATE SET name=excluded.name, lat=excluded.lat, lng=excluded.lng, "
+                    "address=excluded.address, phone=excluded.phone, updated_at=excluded.updated_at",
+                    (poi.id, poi.name, poi.lat, poi.lng, poi.address, poi.phone, now)
+                )
+                rowid = self._conn.execute("SELECT rowid FROM pois WHERE poi_id = ?", (poi.id,)).fetchone()[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO poi_rtree (rowid, min_lat, max_lat, min_lng, max_lng) VALUES (?, ?, ?, ?, ?)",
+                    (rowid, poi.lat, poi.lat, poi.lng, poi.lng)
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO poi_types (type_code, poi_rowid) VALUES (?, ?)", (type_code, rowid)
+                )
+        return len(pois)
+
+    def replace_cell(self, cell: str, type_code: str, pois: List[Poi], complete: bool) -> None:
+        """用新拉取的数据替换网格内某类 POI，并记录拉取时间（同步）"""
+        lat_min, lat_max, lng_min, lng_max = geohash_bounds(cell)
+        with self._conn:
+            # 先解除网格内旧 POI 与该类型的关联，已关闭的门店不再出现在查询结果里
+            self._conn.execute(
+                "DELETE FROM poi_types WHERE type_code = ? AND poi_rowid IN ("
+                "SELECT rowid FROM poi_rtree WHERE min_lat >= ? AND max_lat < ? AND min_lng >= ? AND max_lng < ?)",
+                (type_code, lat_min, lat_max, lng_min, lng_max)
+            )
+        self.upsert_pois(pois, type_code)
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO cells (cell, type_code, fetched_at, complete) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(cell, type_code) DO UPDATE SET fetched_at=excluded.fetched_at, complete=excluded.complete",
+                (cell, type_code, time.time(), int(complete))
+            )
+
+    def mark_complete(self, cells: List[str], type_code: str, fetched_at: Optional[float] = None) -> None:
+        """把网格标记为已完整拉取（批量导入后使用，同步）"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO cells (cell, type_code, fetched_at, complete) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(cell, type_code) DO UPDATE SET fetched_at=excluded.fetched_at, complete=1",
+                [(cell, type_code, fetched_at) for cell in cells]
+            )
+
+    # ---- 查询 ----
+
+    def _covered(self, cells: List[str], type_code: str) -> bool:
+        """网格是否都已完整拉取且未超过最长使用期限；缺失或过期的网格登记为待刷新"""
+        now = time.time()
+        fresh_after = now - settings.poi_store_ttl
+        usable_after = now - settings.poi_store_max_age
+        usable = set()
+        fresh = set()
+        for chunk in _chunks(cells):
+            placeholders = ",".join("?" * len(chunk))
+            for cell, fetched_at in self._conn.execute(
+                f"SELECT cell, fetched_at FROM cells WHERE type_code = ? AND complete = 1 AND cell IN ({placeholders})",
+                [type_code] + chunk
+            ):
+                if fetched_at > usable_after:
+                    usable.add(cell)
+                if fetched_at > fresh_after:
+                    fresh.add(cell)
+
+        stale = [cell for cell in cells if cell not in fresh]
+        if stale:
+            # 登记需求，后台刷新优先处理最近被查询的网格
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO cells (cell, type_code, last_used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(cell, type_code) DO UPDATE SET last_used=excluded.last_used",
+                    [(cell, type_code, now) for cell in stale]
+                )
+        return len(usable) == len(cells)
+
+    def query_sync(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        type_code: str,
+        brands: Optional[List[str]] = None,
+        limit: int = 200
+    ) -> Optional[List[Poi]]:
+        """本地查询半径内某类 POI，按距离排序；覆盖不完整时返回 None（同步）"""
+        box = bounding_box(lat, lng, radius)
+        cells = geohash_cover_box(*box, self.precision)
+        if len(cells) > settings.poi_store_max_cells:
+            return None
+        if not self._covered(cells, type_code):
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        sql = (
+            "SELECT p.poi_id, p.name, p.lat, p.lng, p.address, p.phone FROM poi_rtree r "
+            "JOIN pois p ON p.rowid = r.rowid "
+            "JOIN poi_types t ON t.poi_rowid = r.rowid AND t.type_code = ? "
+            "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lng >= ? AND r.max_lng <= ?"
+        )
+        params: List[Any] = [type_code, *box]
+        if brands:
+            sql += " AND (" + " OR ".join("instr(p.name, ?) > 0" for _ in brands) + ")"
+            params.extend(brands)
+        rows = self._conn.execute(sql, params).fetchall()
+        if not rows:
+            return []
+
+        distances = to_list(distances_one_to_many(
+            lat, lng, [row[2] for row in rows], [row[3] for row in rows], settings.distance_method
+        ))
+        results = [
+            Poi(poi_id, name, p_lat, p_lng, address, phone, distance=distance)
+            for (poi_id, name, p_lat, p_lng, address, phone), distance in zip(rows, distances)
+            if distance <= radius
+        ]
+        results.sort(key=attrgetter("distance"))
+        return results[:limit]
+
+    def stale_cells(self, limit: int) -> List[Tuple[str, str]]:
+        """最近被查询、但缺失或过期的网格（同步）"""
+        now = time.time()
+        return self._conn.execute(
+            "SELECT cell, type_code FROM cells WHERE last_used > ? AND (complete = 0 OR fetched_at < ?) "
+            "AND fetched_at < ? ORDER BY last_used DESC LIMIT ?",
+            (
+                now - settings.poi_store_demand_window,
+                now - settings.poi_store_ttl,
+                # 不完整的网格（过于密集）不要反复拉取
+                now - settings.poi_store_retry_interval,
+                limit
+            )
+        ).fetchall()
+
+    def export_pois(self) -> List[Tuple[Poi, List[str]]]:
+        """全部 POI 及其所属类型，用于构建快照（同步）"""
+        types: Dict[int, List[str]] = {}
+        for type_code, rowid in self._conn.execute("SELECT type_code, poi_rowid FROM poi_types"):
+            types.setdefault(rowid, []).append(type_code)
+        return [
+            (Poi(poi_id, name, lat, lng, address, phone), types[rowid])
+            for rowid, poi_id, name, lat, lng, address, phone in self._conn.execute(
+                "SELECT rowid, poi_id, name, lat, lng, address, phone FROM pois"
+            )
+            if rowid in types
+        ]
+
+    def complete_cells(self) -> Dict[str, List[str]]:
+        """各类型已完整拉取且未超过最长使用期限的网格（同步）"""
+        cells: Dict[str, List[str]] = {}
+        for cell, type_code in self._conn.execute(
+            "SELECT cell, type_code FROM cells WHERE complete = 1 AND fetched_at > ?",
+            (time.time() - settings.poi_store_max_age,)
+        ):
+            cells.setdefault(type_code, []).append(cell)
+        return cells
+
+    def stats(self) -> Dict[str, int]:
+        """库内 POI 数和网格数"""
+        pois = self._conn.execute("SELECT COUNT(*) FROM pois").fetchone()[0]
+        cells = self._conn.execute("SELECT COUNT(*) FROM cells WHERE complete = 1").fetchone()[0]
+        return {"pois": pois, "complete_cells": cells, "hits": self.hits, "misses": self.misses}
+
+    # ---- 异步接口 ----
+
+    async def query(self, *args, **kwargs) -> Optional[List[Poi]]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: self.query_sync(*args, **kwargs)
+        )
+
+    async def add(self, pois: List[Poi], type_code: str) -> int:
+        return await self._run(self.upsert_pois, pois, type_code)
+
+    async def pending_cells(self, limit: int) -> List[Tuple[str, str]]:
+        return await self._run(self.stale_cells, limit)
+
+    async def refresh_cell(self, cell: str, type_code: str) -> int:
+        """从高德按网格拉取某类 POI 并替换，返回 POI 数"""
+        pois, complete = await fetch_polygon_pois(geohash_bounds(cell), type_code, settings.poi_store_cell_max_pages)
+        await self._run(self.replace_cell, cell, type_code, pois, complete)
+        return len(pois)
+
+
+_store: Optional[PoiStore] = None
+_refresh_task: Optional[asyncio.Task] = None
+
+# 最近写入过的 (POI ID, 类型)，避免缓存命中的结果反复写库
+_remembered = TTLCache(max_entries=50000, ttl=3600)
+
+
+def get_store() -> Optional[PoiStore]:
+    """当前 POI 库，未配置时为 None"""
+    return _store
+
+
+def init_store() -> None:
+    """配置了 poi_store_file 时打开 POI 库"""
+    global _store
+    if settings.poi_store_file and _store is None:
+        try:
+            _store = PoiStore(settings.poi_store_file, settings.poi_store_cell_precision)
+        except Exception as e:
+            print(f"POI 库打开失败: {e}")
+
+
+def close_store() -> None:
+    """关闭 POI 库"""
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+def remember(pois: List[Poi], type_code: str) -> None:
+    """后台把高德返回的 POI 写入本地库"""
+    if _store is None or not type_code:
+        return
+    fresh = [poi for poi in pois if _remembered.get((poi.id, type_code)) is None]
+    if not fresh:
+        return
+    for poi in fresh:
+        _remembered.set((poi.id, type_code), True)
+
+    task = asyncio.ensure_future(_store.add(fresh, type_code))
+    task.add_done_callback(lambda t: t.cancelled() or t.exception() and print(f"POI 写入失败: {t.exception()}"))
+
+
+async def _refresh_loop(interval: float, batch: int) -> None:
+    """后台按网格增量刷新被查询过的缺失或过期区域"""
+    while True:
+        try:
+            cells = await _store.pending_cells(batch)
+            for cell, type_code in cells:
+                count = await _store.refresh_cell(cell, type_code)
+                print(f"POI 网格已刷新: {cell} {type_code} {count} 个")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"POI 网格刷新失败: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_background_refresh() -> None:
+    """POI 库可用时启动后台刷新任务"""
+    global _refresh_task
+    if _store is not None and any(settings.amap_keys()) and _refresh_task is None:
+        _refresh_task = asyncio.create_task(
+            _refresh_loop(settings.poi_store_refresh_interval, settings.poi_store_refresh_batch)
+        )
+
+
+async def stop_background_refresh() -> None:
+    """停止后台刷新任务"""
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+
+
+def import_dump(store: PoiStore, path: str, type_code: str, complete: bool = False) -> int:
+    """导入高德格式的 POI 数据（JSON 数组或每行一个 POI 的 JSONL），返回导入数量
+
+    complete 为 True 时把数据外接矩形内的全部网格标记为已完整拉取，
+    只应在数据确实是该区域该类型的全量导出时使用。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        raw_pois = json.loads(text)
+    else:
+        raw_pois = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    pois = parse_pois(raw_pois)
+    store.upsert_pois(pois, type_code)
+
+    if complete and pois:
+        lat_min = min(poi.lat for poi in pois)
+        lat_max = max(poi.lat for poi in pois)
+        lng_min = min(poi.lng for poi in pois)
+        lng_max = max(poi.lng for poi in pois)
+        # 只标记完全落在数据范围内的网格，边缘网格可能只导出了一部分
+        store.mark_complete(geohash_cells_within(lat_min, lat_max, lng_min, lng_max, store.precision), type_code)
+    return len(pois)
+
+
+async def warm_area(store: PoiStore, lat: float, lng: float, radius: float, type_code: str) -> int:
+    """从高德按网格拉取一片区域，返回 POI 总数"""
+    total = 0
+    for cell in geohash_cover_box(*bounding_box(lat, lng, radius), store.precision):
+        total += await store.refresh_cell(cell, type_code)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 POI 库维护")
+    parser.add_argument("--file", default=settings.poi_store_file or "pois.db", help="POI 库文件")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="导入高德格式的 POI 导出文件")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--type", required=True, help="高德 POI 类型码，如 100000")
+    import_parser.add_argument("--complete", action="store_true", help="数据是该区域该类型的全量导出")
+
+    warm_parser = commands.add_parser("warm", help="从高德拉取一片区域")
+    warm_parser.add_argument("--lat", type=float, required=True)
+    warm_parser.add_argument("--lng", type=float, required=True)
+    warm_parser.add_argument("--radius", type=float, default=3000)
+    warm_parser.add_argument("--type", required=True)
+
+    commands.add_parser("stats", help="查看库内数据量")
+
+    args = parser.parse_args()
+    store = PoiStore(args.file, settings.poi_store_cell_precision)
+    try:
+        if args.command == "import":
+            print(f"已导入 {import_dump(store, args.path, args.type, args.complete)} 个 POI")
+        elif args.command == "warm":
+            print(f"已拉取 {asyncio.run(warm_area(store, args.lat, args.lng, args.radius, args.type))} 个 POI")
+        print(json.dumps(store.stats(), ensure_ascii=False))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,86 @@
 """排序服务"""
 from typing import List, Dict, Any, Optional
-from app.services.amap_service import search_subway_stations, calculate_distance
+from app.config import get_settings
+from app.services.amap_service import search_subway_stations
+from app.services.rate_limit import PRIORITY_SEARCH
+from app.services.geo import nearest_indices
+from app.services.poi import Poi, brand_matcher
+from app.services.scoring import resolve_weights, needs_subway_scores, top_k
+from app.services import subway_index
+from app.services.tracing import span
 import asyncio
 
+settings = get_settings()
+
 
 async def rank_results(
-    pois: List[Dict[str, Any]],
+    pois: List[Poi],
     user_location: Dict[str, float],
     sort_by: Optional[str] = None,
     proximity: Optional[str] = None,
     brands: Optional[List[str]] = None,
-    limit: int = 10
-) -> List[Dict[str, Any]]:
-    """对搜索结果进行排序和筛选"""
+    limit: int = 10,
+    weights: Optional[Dict[str, float]] = None
+) -> List[Poi]:
+    """对搜索结果进行筛选，并按排序方式对应的评分项权重选出前 limit 个"""
     
     # 品牌筛选
     if brands:
-        filtered = []
-        for poi in pois:
-            name = poi.get("name", "")
-            if any(brand in name for brand in brands):
-                filtered.append(poi)
-        pois = filtered
+        matches = brand_matcher(brands)
+        pois = [poi for poi in pois if matches(poi)]
     
-    # 如果需要计算到地铁站的距离
-    if proximity == "地铁站" or (sort_by and "地铁" in sort_by):
-        # 搜索附近地铁站
-        subway_stations = await search_subway_stations(
-            location=user_location,
-            radius=10000  # 10公里范围
-        )
-        
-        # 为每个 POI 找到最近的地铁站
-        for poi in pois:
-            nearest_subway = find_nearest_subway(poi, subway_stations)
-            poi["nearest_subway"] = nearest_subway
+    weights = resolve_weights(sort_by, weights)
     
-    # 排序
-    if sort_by and "地铁" in sort_by:
-        # 按距离地铁站排序
-        pois.sort(key=lambda x: x.get("nearest_subway", {}).get("distance", float('inf')))
-    elif sort_by and "评分" in sort_by:
-        # 按评分排序（暂时用距离代替）
-        pois.sort(key=lambda x: x.get("distance", float('inf')))
-    else:
-        # 默认按距离用户排序
-        pois.sort(key=lambda x: x.get("distance", float('inf')))
+    # 如果需要计算到地铁站的距离
+    if proximity == "地铁站" or needs_subway_scores(weights):
+        with span("subway"):
+            index = subway_index.get_index()
+            if index is not None:
+                # 本地索引查询，无需上游调用
+                for poi in pois:
+                    poi.subway = index.nearest(poi.lat, poi.lng, max_distance=settings.subway_max_distance)
+            else:
+                # 搜索附近地铁站
+                subway_stations = await search_subway_stations(
+                    location=user_location,
+                    radius=10000,  # 10公里范围
+                    priority=PRIORITY_SEARCH  # 用户正在等待排序结果，不排在后台预取之后
+                )
+                
+                # 批量为每个 POI 找到最近的地铁站
+                for poi, nearest_subway in zip(pois, find_nearest_subways(pois, subway_stations)):
+                    poi.subway = nearest_subway
     
-    # 限制数量
-    return pois[:limit]
+    return top_k(pois, weights, limit, {"brands": brands})
 
 
-def find_nearest_subway(poi: Dict[str, Any], subway_stations: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+def find_nearest_subway(poi: Poi, subway_stations: List[Poi]) -> Optional[Dict[str, Any]]:
     """找到最近的地铁站"""
-    if not subway_stations:
-        return None
-    
-    poi_loc = poi.get("location", {})
-    min_distance = float('inf')
-    nearest = None
-    
-    for station in subway_stations:
-        station_loc = station.get("location", {})
-        distance = calculate_distance(
-            poi_loc.get("lat", 0), poi_loc.get("lng", 0),
-            station_loc.get("lat", 0), station_loc.get("lng", 0)
-        )
-        
-        if distance < min_distance:
-            min_distance = distance
-            nearest = {
-                "name": station.get("name", ""),
-                "line": None,  # 高德 API 可能不返回线路信息
-                "exit": None,
-                "distance": round(distance, 0)
-            }
-    
-    return nearest
+    return find_nearest_subways([poi], subway_stations)[0]
 
 
-def calculate_score(poi: Dict[str, Any]) -> float:
-    """计算综合得分"""
-    score = 0.0
-    
-    # 距离得分（越近越高）
-    distance = poi.get("distance", 10000)
-    distance_score = max(0, 100 - distance / 100)
-    score += distance_score * 0.6
+def find_nearest_subways(
+    pois: List[Poi],
+    subway_stations: List[Poi]
+) -> List[Optional[Dict[str, Any]]]:
+    """批量找到每个 POI 最近的地铁站"""
+    if not subway_stations:
+        return [None] * len(pois)
     
-    # 地铁站距离得分
-    if poi.get("nearest_subway"):
-        subway_distance = poi["nearest_subway"].get("distance", 10000)
-        subway_score = max(0, 100 - subway_distance / 10)
-        score += subway_score * 0.4
+    indices, distances = nearest_indices(
+        [poi.lat for poi in pois],
+        [poi.lng for poi in pois],
+        [station.lat for station in subway_stations],
+        [station.lng for station in subway_stations],
+        settings.distance_method
+    )
     
-    return score
-
+    return [
+        {
+            "name": subway_stations[index].name,
+            "line": None,  # 高德 API 可能不返回线路信息
+            "exit": None,
+            "distance": round(distance, 0)
+        }
+        for index, distance in zip(indices, distances)
+    ]
@@ -0,0 +1,195 @@
+"""上游限流 - 令牌桶 + AIMD 自适应并发 + 优先级排队"""
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+# 请求优先级（数值越小越优先）
+PRIORITY_ROUTE = 0
+PRIORITY_SEARCH = 1
+PRIORITY_PREFETCH = 2
+
+# 调用结果
+OUTCOME_OK = "ok"
+OUTCOME_THROTTLED = "throttled"  # QPS 超限，需要退避
+OUTCOME_EXHAUSTED = "exhausted"  # 当日配额用尽，Key 暂停到次日
+OUTCOME_ERROR = "error"  # 其他错误，不影响并发限制
+
+_BEIJING = timezone(timedelta(hours=8))
+
+
+class TokenBucket:
+    """令牌桶"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """距离下一个令牌可用的秒数，不取令牌"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_take(self, now: float) -> float:
+        """尝试取一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        wait = self.wait_time(now)
+        if wait == 0:
+            self.tokens -= 1
+        return wait
+
+    def drain(self, now: float) -> None:
+        """被上游限流时清空令牌"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+def seconds_until_quota_reset() -> float:
+    """距离高德日配额重置（北京时间零点）的秒数"""
+    now = datetime.now(_BEIJING)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+class UpstreamGate:
+    """多 Key 上游闸门
+
+    每个 Key 一个令牌桶，请求在 Key 之间轮换；并发上限按 AIMD 调整：
+    成功时缓慢增加，收到限流错误时减半。排队请求按优先级放行。
+    所有 Key 都在 queue_timeout 内不可用（如当日配额均已用尽）时立即失败，不再排队等到超时。
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        qps_per_key: float,
+        initial_limit: float,
+        min_limit: float,
+        max_limit: float,
+        queue_timeout: float
+    ):
+        self.keys = keys
+        self.queue_timeout = queue_timeout
+        self.buckets: Dict[str, TokenBucket] = {key: TokenBucket(qps_per_key, qps_per_key) for key in keys}
+        self.exhausted_until: Dict[str, float] = {}
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.throttled = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._next_key = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(self, priority: int = PRIORITY_SEARCH) -> str:
+        """排队等待放行，返回本次请求使用的 Key
+
+        排队超过 queue_timeout，或所有 Key 在 queue_timeout 内都不可用时抛出 asyncio.TimeoutError。
+        """
+        if self._next_available(time.monotonic()) > self.queue_timeout:
+            raise asyncio.TimeoutError("没有可在排队时限内使用的 Key")
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # 已放行但调用方被取消，归还并发额度
+                self.release(future.result(), OUTCOME_ERROR)
+            else:
+                future.cancel()
+            raise
+
+    @property
+    def queued(self) -> int:
+        """排队中的请求数"""
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def release(self, key: str, outcome: str) -> None:
+        """请求结束后归还额度并调整并发上限"""
+        self.in_flight -= 1
+        now = time.monotonic()
+
+        if outcome == OUTCOME_OK:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif outcome == OUTCOME_THROTTLED:
+            self.throttled += 1
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.buckets[key].drain(now)
+        elif outcome == OUTCOME_EXHAUSTED:
+            self.throttled += 1
+            self.exhausted_until[key] = now + seconds_until_quota_reset()
+
+        self._dispatch()
+
+    def _next_available(self, now: float) -> float:
+        """最早有 Key 可用的等待秒数（暂停到次日的 Key 按暂停结束计），没有 Key 时为无穷大"""
+        wait = float("inf")
+        for key in self.keys:
+            wait = min(wait, max(self.exhausted_until.get(key, 0) - now, self.buckets[key].wait_time(now)))
+        return wait
+
+    def _pick_key(self, now: float) -> Tuple[Optional[str], float]:
+        """轮换选择有令牌的 Key，没有时返回最短等待时间"""
+        wait = float("inf")
+        for offset in range(len(self.keys)):
+            index = (self._next_key + offset) % len(self.keys)
+            key = self.keys[index]
+            if self.exhausted_until.get(key, 0) > now:
+                wait = min(wait, self.exhausted_until[key] - now)
+                continue
+            key_wait = self.buckets[key].try_take(now)
+            if key_wait == 0:
+                self._next_key = index + 1
+                return key, 0.0
+            wait = min(wait, key_wait)
+        return None, wait
+
+    def _dispatch(self) -> None:
+        """按优先级放行排队请求"""
+        while self._waiters and self.in_flight < max(1, int(self.limit)):
+            future = self._waiters[0][2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            key, wait = self._pick_key(time.monotonic())
+            if key is None and wait > self.queue_timeout:
+                # 排队中的请求都等不到可用的 Key，立即全部失败
+                while self._waiters:
+                    future = heapq.heappop(self._waiters)[2]
+                    if not future.done():
+                        future.set_exception(asyncio.TimeoutError("没有可在排队时限内使用的 Key"))
+                return
+            if key is None:
+                self._schedule(wait)
+                return
+
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            future.set_result(key)
+
+    def _schedule(self, delay: float) -> None:
+        """令牌不足时稍后再尝试放行"""
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            return
+
+        def fire() -> None:
+            self._timer = None
+            self._dispatch()
+
+        self._timer_loop = loop
+        self._timer = loop.call_later(min(delay, 1.0), fire)
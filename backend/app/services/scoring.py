@@ -0,0 +1,192 @@
+"""多因素排序 - 可插拔的加权评分项 + 堆选 top-k
+
+每个评分项把一批 POI 映射为 [0, 1] 的得分（越大越好），排序方式就是一组评分项权重。
+所有启用的评分项一次性批量计算（安装 NumPy 时向量化），加权求和后用 argpartition 选出前 k 个，
+只对这 k 个排序。只启用一个评分项时，如果该项登记了单调的排序键，直接按键堆选，不计算得分。
+得分相同时保持输入顺序（候选已按距离用户排序）。
+
+新增评分项：
+
+    @scorer("name", key=...)  # key 可选：值越小得分越高，且与得分严格单调对应
+    def name_score(pois, context):
+        return [...]
+"""
+import heapq
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from app.config import get_settings
+from app.services.geo import np
+from app.services.poi import Poi, brand_matcher
+
+settings = get_settings()
+
+# 评分项：名称 -> 函数 (POI 列表, 上下文) -> 每个 POI 的得分
+Scorer = Callable[[List[Poi], Dict[str, Any]], Sequence[float]]
+SCORERS: Dict[str, Scorer] = {}
+# 评分项 -> 等价的升序排序键 POI -> 数值
+SORT_KEYS: Dict[str, Callable[[Poi], float]] = {}
+
+# 排序方式关键词 -> 评分项权重，按顺序取第一个出现在 sort_by 中的
+SORT_MODES = [
+    ("地铁", {"subway": 1.0}),
+    ("评分", {"rating": 1.0}),
+    ("好评", {"rating": 1.0}),
+    ("便宜", {"cost": 1.0}),
+    ("价格", {"cost": 1.0}),
+    ("综合", {"distance": 0.5, "subway": 0.2, "rating": 0.2, "brand": 0.1}),
+    ("推荐", {"distance": 0.5, "subway": 0.2, "rating": 0.2, "brand": 0.1}),
+]
+DEFAULT_WEIGHTS = {"distance": 1.0}
+
+# 依赖高德详情字段（extensions=all 的 biz_ext）的评分项
+DETAIL_SCORERS = {"rating", "cost"}
+
+
+def scorer(name: str, key: Optional[Callable[[Poi], float]] = None) -> Callable[[Scorer], Scorer]:
+    """注册评分项"""
+    def register(func: Scorer) -> Scorer:
+        SCORERS[name] = func
+        if key is not None:
+            SORT_KEYS[name] = key
+        return func
+    return register
+
+
+def _column(values: List[Optional[float]], missing: float):
+    """一列数值，缺失值替换为 missing"""
+    if np is not None:
+        try:
+            return np.fromiter(values, dtype=float, count=len(values))
+        except TypeError:
+            # 有缺失值时才逐个替换，多数列（距离）没有缺失
+            return np.fromiter((missing if value is None else value for value in values), dtype=float, count=len(values))
+    return [missing if value is None else value for value in values]
+
+
+def _subway_distance(poi: Poi) -> float:
+    return poi.subway["distance"] if poi.subway else float("inf")
+
+
+def _rating_key(poi: Poi) -> float:
+    return -min(max(poi.rating or 0.0, 0.0), 5.0)
+
+
+def _cost_key(poi: Poi) -> float:
+    return float("inf") if poi.cost is None else poi.cost
+
+
+def _decay(values, scale: float):
+    """把越小越好的数值映射到 (0, 1]：scale / (scale + x)，单调且不饱和"""
+    if np is not None:
+        return scale / (scale + values)
+    return [scale / (scale + value) for value in values]
+
+
+@scorer("distance", key=attrgetter("distance"))
+def distance_score(pois: List[Poi], context: Dict[str, Any]):
+    """离用户越近越高"""
+    return _decay(_column(list(map(attrgetter("distance"), pois)), float("inf")), settings.rank_distance_scale)
+
+
+@scorer("subway", key=_subway_distance)
+def subway_score(pois: List[Poi], context: Dict[str, Any]):
+    """离最近地铁站越近越高，没有地铁站信息时为 0"""
+    return _decay(_column(list(map(_subway_distance, pois)), 0.0), settings.rank_subway_scale)
+
+
+@scorer("rating", key=_rating_key)
+def rating_score(pois: List[Poi], context: Dict[str, Any]):
+    """高德评分（5 分制）越高越高，没有评分时为 0"""
+    ratings = _column(list(map(attrgetter("rating"), pois)), 0.0)
+    if np is not None:
+        return np.clip(ratings / 5.0, 0.0, 1.0)
+    return [min(max(rating / 5.0, 0.0), 1.0) for rating in ratings]
+
+
+@scorer("cost", key=_cost_key)
+def cost_score(pois: List[Poi], context: Dict[str, Any]):
+    """人均消费越低越高，没有价格时为 0"""
+    return _decay(_column(list(map(attrgetter("cost"), pois)), float("inf")), settings.rank_cost_scale)
+
+
+@scorer("brand")
+def brand_score(pois: List[Poi], context: Dict[str, Any]):
+    """指定了品牌时匹配的为 1，否则知名品牌为 1"""
+    brands = context.get("brands")
+    if not brands:
+        return [1.0 if poi.brand >= 0 else 0.0 for poi in pois]
+    matches = brand_matcher(brands)
+    return [1.0 if matches(poi) else 0.0 for poi in pois]
+
+
+def resolve_weights(sort_by: Optional[str], weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """确定本次排序的评分项权重：显式权重优先，其次按 sort_by 关键词，默认按距离"""
+    if weights:
+        unknown = set(weights) - set(SCORERS)
+        if unknown:
+            raise ValueError(f"未知的评分项: {', '.join(sorted(unknown))}")
+        return {name: weight for name, weight in weights.items() if weight}
+    if sort_by:
+        for keyword, mode in SORT_MODES:
+            if keyword in sort_by:
+                return mode
+    return DEFAULT_WEIGHTS
+
+
+def score_pois(pois: List[Poi], weights: Dict[str, float], context: Dict[str, Any]):
+    """一次计算全部启用评分项的加权总分（安装 NumPy 时为数组）"""
+    total = None
+    for name, weight in weights.items():
+        scores = SCORERS[name](pois, context)
+        if np is not None:
+            weighted = weight * np.asarray(scores, dtype=float)
+            total = weighted if total is None else total + weighted
+        else:
+            weighted = [weight * score for score in scores]
+            total = weighted if total is None else [current + score for current, score in zip(total, weighted)]
+    if total is None:
+        return [0.0] * len(pois)
+    return total
+
+
+def top_k(pois: List[Poi], weights: Dict[str, float], k: int, context: Optional[Dict[str, Any]] = None) -> List[Poi]:
+    """按加权总分选出前 k 个，得分相同时保持输入顺序"""
+    if not pois or k <= 0:
+        return []
+    context = context or {}
+    active = [name for name, weight in weights.items() if weight]
+    if len(active) == 1 and weights[active[0]] > 0 and active[0] in SORT_KEYS:
+        # 单项排序：得分是排序键的严格单调函数，直接按键堆选
+        return heapq.nsmallest(k, pois, key=SORT_KEYS[active[0]])
+    scores = score_pois(pois, weights, context)
+    if np is not None and not isinstance(scores, list):
+        indices = _top_indices(-scores, k)
+    else:
+        indices = heapq.nlargest(k, range(len(pois)), key=scores.__getitem__)
+    return [pois[index] for index in indices]
+
+
+def _top_indices(costs, k: int) -> List[int]:
+    """costs 最小的 k 个下标，按 (cost, 下标) 排序
+
+    argpartition 只保证第 k 个位置正确，边界上得分相同的候选按下标补齐，结果与稳定排序一致。
+    """
+    if k < len(costs):
+        threshold = costs[np.argpartition(costs, k - 1)[k - 1]]
+        better = np.flatnonzero(costs < threshold)
+        ties = np.flatnonzero(costs == threshold)[:k - len(better)]
+        candidates = np.concatenate((better, ties))
+    else:
+        candidates = np.arange(len(costs))
+    # lexsort 以最后一个键为主键
+    return candidates[np.lexsort((candidates, costs[candidates]))].tolist()
+
+
+def needs_subway_scores(weights: Dict[str, float]) -> bool:
+    """是否需要地铁站距离"""
+    return bool(weights.get("subway"))
+
+
+def needs_details(weights: Dict[str, float]) -> bool:
+    """是否需要评分、人均消费等详情字段"""
+    return any(weights.get(name) for name in DETAIL_SCORERS)
@@ -0,0 +1,195 @@
+"""搜索编排 - 组合 POI 搜索与排序"""
+import asyncio
+from operator import attrgetter
+from typing import List, Dict, Optional
+from app.config import get_settings
+from app.services.amap_service import search_nearby_pois, CATEGORY_MAPPING
+from app.services import poi_store
+from app.services.poi import Poi, brand_matcher
+from app.services.scoring import resolve_weights, needs_subway_scores, needs_details
+from app.services.snapshot import get_snapshot
+
+settings = get_settings()
+
+
+def build_keywords(brands: Optional[List[str]], subcategory: Optional[str]) -> Optional[str]:
+    """构建高德搜索关键词"""
+    if brands:
+        return "|".join(brands)
+    elif subcategory:
+        return subcategory
+    return None
+
+
+def needs_subway(sort_by: Optional[str], proximity: Optional[str]) -> bool:
+    """排序或筛选是否依赖地铁站距离"""
+    return proximity == "地铁站" or needs_subway_scores(resolve_weights(sort_by))
+
+
+def needs_detail(sort_by: Optional[str], weights: Optional[Dict[str, float]] = None) -> bool:
+    """排序是否依赖高德详情字段（评分、人均消费）"""
+    return needs_details(resolve_weights(sort_by, weights))
+
+
+async def fetch_candidates(
+    location: Dict[str, float],
+    category: str,
+    radius: int,
+    limit: int,
+    keywords: Optional[str] = None,
+    brands: Optional[List[str]] = None,
+    detail: bool = False
+) -> List[Poi]:
+    """获取待排序的候选 POI
+
+    依次尝试 POI 快照和本地 POI 库，查询区域已完整覆盖时直接返回，否则查询高德并写入本地库。
+    有品牌筛选时分页拉取，直到品牌匹配的 POI 足够排序使用。
+    detail 为 True（按评分或价格排序）时本地数据缺少这些字段，直接查询高德详情。
+    """
+    type_code = CATEGORY_MAPPING.get(category, "")
+    local = bool(type_code and (brands or not keywords)) and not detail
+    snapshot = get_snapshot()
+    if snapshot is not None and local:
+        pois = snapshot.query(
+            location["lat"], location["lng"], radius, type_code,
+            brands=brands, limit=200 if brands else limit * 2
+        )
+        if pois is not None:
+            return with_category(pois, category)
+    
+    store = poi_store.get_store()
+    if store is not None and local:
+        # 本地库只能按名称匹配品牌，子类型等其他关键词仍交给高德
+        try:
+            pois = await store.query(
+                location["lat"], location["lng"], radius, type_code,
+                brands=brands, limit=200 if brands else limit * 2
+            )
+            if pois is not None:
+                return with_category(pois, category)
+        except Exception as e:
+            print(f"本地 POI 库查询失败: {e}")
+    
+    if brands and len(brands) > 1 and settings.brand_fanout_enabled:
+        pois = await fetch_brand_candidates(location, category, radius, limit, brands, detail)
+        if store is not None and type_code:
+            poi_store.remember(pois, type_code)
+        return pois
+    
+    accept = None
+    max_pages = 1
+    if brands:
+        max_pages = settings.amap_max_pages
+        accept = brand_matcher(brands)
+    
+    pois = await search_nearby_pois(
+        location=location,
+        category=category,
+        radius=radius,
+        keywords=keywords,
+        limit=limit * 2,  # 多获取一些用于筛选
+        max_pages=max_pages,
+        accept=accept,
+        want=limit * 2,
+        detail=detail
+    )
+    if store is not None and type_code:
+        poi_store.remember(pois, type_code)
+    return pois
+
+
+def brand_groups(brands: List[str], max_groups: int) -> List[List[str]]:
+    """把品牌轮流分到至多 max_groups 组，每组一次高德查询"""
+    count = max(1, min(len(brands), max_groups))
+    return [brands[index::count] for index in range(count)]
+
+
+async def fetch_brand_candidates(
+    location: Dict[str, float],
+    category: str,
+    radius: int,
+    limit: int,
+    brands: List[str],
+    detail: bool = False
+) -> List[Poi]:
+    """多品牌搜索：每组品牌单独查询高德，合并去重后各品牌轮流填充候选
+
+    所有品牌合成一个关键词查询时，结果会被最密集的品牌占满；分组查询后每个品牌都有自己的候选。
+    各组共享 brand_fanout_deadline，已有组返回后超时未完成的组直接放弃。
+    单个品牌的查询与单品牌搜索共用周边搜索缓存。
+    """
+    groups = brand_groups(brands, settings.brand_fanout_max_groups)
+    want = max(1, -(-limit * 2 // len(groups)))
+    tasks = [
+        asyncio.create_task(search_nearby_pois(
+            location=location,
+            category=category,
+            radius=radius,
+            keywords="|".join(group),
+            limit=want,
+            max_pages=settings.amap_max_pages,
+            accept=brand_matcher(group),
+            want=want,
+            detail=detail
+        ))
+        for group in groups
+    ]
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=settings.brand_fanout_deadline)
+        if not done:
+            # 一组都没有返回时等到第一组为止，不因时限返回空结果
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if pending:
+            print(f"多品牌搜索 {len(pending)}/{len(groups)} 组超过时限，已放弃")
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    results = []
+    for task in tasks:
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            print(f"多品牌搜索分组失败: {task.exception()}")
+            continue
+        results.extend(task.result())
+    return fair_fill(results, brands, limit * 2)
+
+
+def fair_fill(pois: List[Poi], brands: List[str], quota: int) -> List[Poi]:
+    """按 id 去重后各品牌按距离轮流取候选，某品牌不足时余量留给其他品牌，结果按距离排序"""
+    queues = []
+    for brand in brands:
+        matches = brand_matcher([brand])
+        queues.append(sorted((poi for poi in pois if matches(poi)), key=attrgetter("distance")))
+    
+    chosen: List[Poi] = []
+    seen = set()
+    positions = [0] * len(queues)
+    while len(chosen) < quota:
+        progressed = False
+        for index, queue in enumerate(queues):
+            # 跳过已被其他品牌取走的 POI（名称同时包含多个品牌或多组返回同一 POI）
+            while positions[index] < len(queue) and queue[positions[index]].id in seen:
+                positions[index] += 1
+            if positions[index] >= len(queue):
+                continue
+            poi = queue[positions[index]]
+            positions[index] += 1
+            seen.add(poi.id)
+            chosen.append(poi)
+            progressed = True
+            if len(chosen) >= quota:
+                break
+        if not progressed:
+            break
+    
+    chosen.sort(key=attrgetter("distance"))
+    return chosen
+
+
+def with_category(pois: List[Poi], category: str) -> List[Poi]:
+    """本地数据不带类别，补上与高德结果一致的类别"""
+    for poi in pois:
+        poi.category = category
+    return pois
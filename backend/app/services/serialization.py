@@ -0,0 +1,45 @@
+"""JSON 编解码 - 内部可信数据直接编码为响应，上游响应用 orjson 解码
+
+FastAPI 默认会把端点返回值按 response_model 校验一遍，再逐层转换为 JSON 兼容对象后交给标准库 json 编码。
+搜索和路线结果由服务层按响应模型的结构生成，无需再次校验：typed_response 跳过这两步，
+直接用 orjson（未安装时退回标准库 json）编码，端点的 response_model 仍用于接口文档。
+开启 validate_responses 时先按响应模型校验，用于开发和测试。
+上游（高德）响应体用 loads 解码，同样优先使用 orjson。
+"""
+import json
+from typing import Any, Type
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.config import get_settings
+from app.services.tracing import span
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+settings = get_settings()
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 编码的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """解码 JSON 响应体"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def typed_response(model: Type[BaseModel], status_code: int = 200, **content: Any) -> FastJSONResponse:
+    """按响应模型的字段组装响应并直接编码（content 中的值须为 JSON 兼容对象）"""
+    with span("serialize"):
+        if settings.validate_responses:
+            model.model_validate(content)
+        return FastJSONResponse(content, status_code=status_code)
@@ -0,0 +1,365 @@
+"""跨进程共享缓存 - 进程内 L1 + 共享 L2
+
+`uvicorn --workers N` 时每个 worker 的内存缓存各自独立、各自冷启动。SharedCache 在进程内
+TTLCache（L1）之外接入一个共享后端（L2）：L1 未命中或只有陈旧数据时查 L2，L2 命中后回填 L1；
+写入时同步写 L1，L2 在后台写入，不增加请求延迟。
+
+后端：
+    sqlite  单机多进程共享的 SQLite（WAL）文件，按过期时间淘汰，条目数有上限
+    redis   Redis 协议（RESP），容量由服务端 maxmemory 策略控制
+
+值用 marshal 编码：缓存的是已解析的 POI、路线和解析结果（dict/list/str/float），
+解码比 JSON 快一倍以上，且读取时无需重新解析高德原始响应。marshal 格式只保证同一 Python 版本内兼容，
+键前缀带上 Python 和 marshal 版本，不同版本的 worker 互不读取对方的条目；无法解码的条目按未命中处理。
+"""
+import asyncio
+import json
+import marshal
+import sqlite3
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlsplit, unquote
+from app.config import get_settings
+from app.services.cache import TTLCache
+
+settings = get_settings()
+
+# 编码格式版本（含 Python / marshal 版本），格式变化时旧条目自然失效
+KEY_PREFIX = f"dollynav:v3:py{sys.version_info[0]}{sys.version_info[1]}m{marshal.version}:"
+
+# L2 条目头：过期时间、陈旧期截止时间（Unix 时间戳）
+_ENTRY_HEADER = struct.Struct("<dd")
+
+
+def encode_key(namespace: str, key: Hashable) -> str:
+    return KEY_PREFIX + namespace + ":" + json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_value(value: Any, expires_at: float, stale_until: float) -> bytes:
+    return _ENTRY_HEADER.pack(expires_at, stale_until) + marshal.dumps(value, 4)
+
+
+def decode_value(data: bytes) -> Tuple[Any, float, float]:
+    expires_at, stale_until = _ENTRY_HEADER.unpack_from(data)
+    return marshal.loads(data[_ENTRY_HEADER.size:]), expires_at, stale_until
+
+
+class CacheBackend:
+    """L2 后端接口，值为 encode_value 编码后的字节串"""
+
+    name = ""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        """写入条目，ttl 秒后（陈旧期结束）可被删除"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(CacheBackend):
+    """SQLite 共享缓存
+
+    WAL 模式下多个进程可同时读、串行写；每个进程的读和写各用一个专用线程和连接，
+    后台写入和淘汰不会阻塞读取。读取超过 timeout 秒按未命中处理（与 Redis 后端一致）。
+    每写入一批后清理过期条目，超出容量时按到期时间从早到晚淘汰。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int, timeout: float = 0.2):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache")
+        self._conn = self._executor.submit(self._connect).result()
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache-read")
+        self._read_conn = self._read_executor.submit(
+            sqlite3.connect, path, check_same_thread=False, timeout=timeout
+        ).result()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=2.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                delete_after REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS cache_delete_after ON cache (delete_after);
+        """)
+        return conn
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._read_conn.execute(
+            "SELECT value FROM cache WHERE key = ? AND delete_after > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, data: bytes, ttl: float) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, delete_after) VALUES (?, ?, ?)",
+                (key, data, time.time() + ttl)
+            )
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM cache WHERE delete_after <= ?", (time.time(),))
+            excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY delete_after LIMIT ?)",
+                    (excess,)
+                )
+
+    async def get(self, key: str) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self._read_executor, self._get, key), self.timeout)
+
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        await self._run(self._set, key, data, ttl)
+
+    async def close(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._read_executor, self._read_conn.close)
+        self._read_executor.shutdown()
+        await self._run(self._conn.close)
+        self._executor.shutdown()
+
+
+class RedisError(Exception):
+    """Redis 返回的错误"""
+
+
+def _encode_command(args: Tuple[Any, ...]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        elif not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis 连接已关闭")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode()
+    if prefix == b"-":
+        raise RedisError(body.decode())
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if prefix == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise RedisError(f"无法识别的响应: {line!r}")
+
+
+class RedisBackend(CacheBackend):
+    """Redis 协议后端（内置最小 RESP 客户端，无需额外依赖）
+
+    连接按需建立并复用，最多 pool_size 个；超时或连接出错时丢弃该连接。
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, pool_size: int = 4, timeout: float = 0.2):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        commands = []
+        if self.password:
+            commands.append(("AUTH", self.password))
+        if self.db:
+            commands.append(("SELECT", self.db))
+        try:
+            for command in commands:
+                writer.write(_encode_command(command))
+                await writer.drain()
+                await _read_reply(reader)
+        except Exception:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _roundtrip(self, holder: list, args: Tuple[Any, ...]) -> Any:
+        if holder[0] is None:
+            holder[0] = await self._connect()
+        reader, writer = holder[0]
+        writer.write(_encode_command(args))
+        await writer.drain()
+        return await _read_reply(reader)
+
+    async def execute(self, *args: Any) -> Any:
+        """执行一条命令"""
+        async with self._slots:
+            holder = [self._idle.pop() if self._idle else None]
+            try:
+                reply = await asyncio.wait_for(self._roundtrip(holder, args), self.timeout)
+            except RedisError:
+                self._idle.append(holder[0])
+                raise
+            except BaseException:
+                # 超时或连接错误后连接状态未知，直接丢弃
+                if holder[0] is not None:
+                    holder[0][1].close()
+                raise
+            self._idle.append(holder[0])
+            return reply
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        await self.execute("SET", key, data, "PX", max(int(ttl * 1000), 1))
+
+    async def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class SharedCache(TTLCache):
+    """带共享 L2 的缓存
+
+    同步接口（get、get_entry、set、dump 等）与 TTLCache 相同，只作用于 L1，写入会同步到 L2；
+    lookup 在 L1 没有新鲜数据时查询 L2。未配置共享后端时与 TTLCache 完全一致。
+    """
+
+    def __init__(self, namespace: str, max_entries: int, ttl: float, stale_ttl: float = 0.0):
+        super().__init__(max_entries, ttl, stale_ttl)
+        self.namespace = namespace
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self._writes = set()
+
+    async def lookup(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """读取条目，返回 (值, 是否新鲜)；L1 没有新鲜数据时查询 L2 并回填"""
+        entry = self.get_entry(key)
+        if (entry is not None and entry[1]) or _backend is None:
+            return entry
+
+        try:
+            data = await _backend.get(encode_key(self.namespace, key))
+            if data is None:
+                self.l2_misses += 1
+                return entry
+            value, expires_at, stale_until = decode_value(data)
+        except Exception as e:
+            # 后端故障、超时或条目损坏都按未命中处理
+            self.l2_errors += 1
+            print(f"共享缓存读取失败: {e}")
+            return entry
+        now = time.time()
+        if stale_until <= now:
+            self.l2_misses += 1
+            return entry
+        self.l2_hits += 1
+        if expires_at <= now:
+            # L2 也只有陈旧数据，优先使用 L1 已有的
+            return entry or (value, False)
+        super().set(key, value, ttl=expires_at - now)
+        return value, True
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入 L1，并在后台写入 L2"""
+        super().set(key, value, ttl)
+        if _backend is None:
+            return
+
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        stale_until = expires_at + self.stale_ttl
+        data = encode_value(value, expires_at, stale_until)
+        task = asyncio.ensure_future(self._write(encode_key(self.namespace, key), data, stale_until - time.time()))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, key: str, data: bytes, ttl: float) -> None:
+        try:
+            await _backend.set(key, data, ttl)
+        except Exception as e:
+            self.l2_errors += 1
+            print(f"共享缓存写入失败: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats.update(l2_hits=self.l2_hits, l2_misses=self.l2_misses, l2_errors=self.l2_errors)
+        return stats
+
+
+_backend: Optional[CacheBackend] = None
+
+
+def get_backend() -> Optional[CacheBackend]:
+    """当前共享后端，未配置时为 None"""
+    return _backend
+
+
+def init_backend() -> None:
+    """按配置创建共享后端（应用启动时调用）"""
+    global _backend
+    if not settings.shared_cache_backend:
+        return
+    try:
+        if settings.shared_cache_backend == "sqlite":
+            _backend = SQLiteBackend(
+                settings.shared_cache_file,
+                settings.shared_cache_max_entries,
+                timeout=settings.shared_cache_timeout
+            )
+        elif settings.shared_cache_backend == "redis":
+            _backend = RedisBackend(
+                settings.shared_cache_redis_url,
+                pool_size=settings.shared_cache_pool_size,
+                timeout=settings.shared_cache_timeout
+            )
+        else:
+            print(f"未知的共享缓存后端: {settings.shared_cache_backend}")
+            return
+        print(f"共享缓存已启用: {_backend.name}")
+    except Exception as e:
+        print(f"共享缓存初始化失败: {e}")
+        _backend = None
+
+
+async def close_backend() -> None:
+    """关闭共享后端（应用关闭时调用）"""
+    global _backend
+    if _backend is not None:
+        backend, _backend = _backend, None
+        await backend.close()
@@ -0,0 +1,53 @@
+"""请求合并 - 相同参数的并发上游调用只执行一次"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """进行中的调用"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """相同 key 的并发调用共享同一个进行中的任务
+
+    结果或异常会传递给所有等待者；全部等待者都取消时才取消底层任务。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.shared = 0  # 被合并（未实际发起）的调用次数
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 factory()，同 key 已有进行中的调用时等待其结果"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done():
+                # 等待者自身被取消，最后一个离开时取消底层任务
+                call.waiters -= 1
+                if call.waiters == 0:
+                    self._forget(key, call)
+                    call.task.cancel()
+            raise
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
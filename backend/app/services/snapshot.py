@@ -0,0 +1,343 @@
+"""POI 快照 - 离线构建、内存映射只读的列式二进制文件
+
+多个 uvicorn worker 映射同一个文件，数据只在操作系统页缓存中保留一份，
+常驻内存不随 worker 数增长；启动时只解析很小的元数据，几乎没有加载耗时。
+
+文件格式（小端）：
+    8 字节魔数 | 8 字节元数据偏移 | 8 字节元数据长度 | 各列数据（8 字节对齐）| 元数据 JSON
+
+列：lat/lng（float64，按纬度升序排列）、type（uint32，高德类型码）、brand（int16，品牌表下标，
+-1 表示无），以及 id/name/address/phone 四个字符串列（uint32 偏移数组 + UTF-8 字节串）。
+元数据记录各列偏移、品牌表，以及各类型完整覆盖的 geohash 网格。
+
+    python -m app.services.snapshot build --store pois.db --out pois.snap
+    python -m app.services.snapshot build --dump hotels.jsonl --type 100000 --complete --out pois.snap
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from app.config import get_settings
+from app.services.geo import (
+    np, bounding_box, geohash_cover_box, geohash_cells_within, distances_one_to_many, to_list
+)
+from app.services.poi import Poi, BRANDS, BRAND_IDS
+
+settings = get_settings()
+
+MAGIC = b"DNSNAP01"
+_HEADER = struct.Struct("<8sQQ")
+
+# 列名 -> (数组类型码, NumPy dtype)
+NUMERIC_COLUMNS = {
+    "lat": ("d", "<f8"),
+    "lng": ("d", "<f8"),
+    "type": ("I", "<u4"),
+    "brand": ("h", "<i2"),
+}
+STRING_COLUMNS = ("id", "name", "address", "phone")
+
+
+def type_divisor(type_code: str) -> int:
+    """类型码末尾成对的 0 表示大类，按大类匹配时用于整除的除数"""
+    divisor = 1
+    while len(type_code) > 2 and type_code.endswith("00"):
+        type_code = type_code[:-2]
+        divisor *= 100
+    return divisor
+
+
+def most_specific(type_codes: Sequence[str]) -> str:
+    """多个类型中最具体的一个（末尾 0 最少）"""
+    return min(type_codes, key=type_divisor)
+
+
+def write_snapshot(
+    path: str,
+    rows: Iterable[Tuple[Poi, str]],
+    cells: Dict[str, List[str]],
+    precision: int
+) -> int:
+    """把 (POI, 类型码) 写入快照文件（先写临时文件再替换），返回 POI 数"""
+    rows = sorted(rows, key=lambda row: row[0].lat)
+    columns = {name: array(code) for name, (code, _) in NUMERIC_COLUMNS.items()}
+    strings = {name: (array("I", [0]), bytearray()) for name in STRING_COLUMNS}
+
+    for poi, type_code in rows:
+        columns["lat"].append(poi.lat)
+        columns["lng"].append(poi.lng)
+        columns["type"].append(int(type_code[:6] or 0))
+        columns["brand"].append(poi.brand)
+        for name in STRING_COLUMNS:
+            offsets, blob = strings[name]
+            blob.extend((getattr(poi, name) or "").encode("utf-8"))
+            offsets.append(len(blob))
+
+    layout: Dict[str, List[int]] = {}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, 0, 0))
+
+        def write_block(key: str, data: bytes) -> None:
+            f.write(b"\0" * (-f.tell() % 8))
+            layout[key] = [f.tell(), len(data)]
+            f.write(data)
+
+        for name, values in columns.items():
+            write_block(name, values.tobytes())
+        for name, (offsets, blob) in strings.items():
+            write_block(f"{name}_offsets", offsets.tobytes())
+            write_block(f"{name}_data", bytes(blob))
+
+        meta = json.dumps({
+            "count": len(rows),
+            "layout": layout,
+            "brands": BRANDS,
+            "precision": precision,
+            "cells": cells,
+            "built_at": time.time(),
+        }, ensure_ascii=False).encode("utf-8")
+        meta_offset = f.tell()
+        f.write(meta)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, meta_offset, len(meta)))
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+class PoiSnapshot:
+    """内存映射的只读 POI 快照
+
+    数值列是直接指向映射内存的零拷贝视图（安装 NumPy 时为 ndarray，否则为 memoryview），
+    字符串只在返回结果时按需解码。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, meta_offset, meta_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"不是 POI 快照文件: {path}")
+        meta = json.loads(self._mm[meta_offset:meta_offset + meta_length])
+        self.count = meta["count"]
+        self.brands: List[str] = meta["brands"]
+        self.precision: int = meta["precision"]
+        self.built_at: float = meta["built_at"]
+        self.cells = {type_code: set(cells) for type_code, cells in meta["cells"].items()}
+        self._layout = meta["layout"]
+        # 快照内品牌下标 -> 当前品牌表编号（快照构建后品牌表可能有变化）
+        self._brand_map = [BRAND_IDS.get(brand, -1) for brand in self.brands]
+        self._brand_set = set(self.brands)
+        self.hits = 0
+        self.misses = 0
+
+        for name, (code, dtype) in NUMERIC_COLUMNS.items():
+            setattr(self, name, self._view(name, code, dtype))
+        self._strings = {
+            name: (self._view(f"{name}_offsets", "I", "<u4"), self._layout[f"{name}_data"][0])
+            for name in STRING_COLUMNS
+        }
+
+    def _view(self, key: str, code: str, dtype: str):
+        offset, length = self._layout[key]
+        if np is not None:
+            return np.frombuffer(self._mm, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+        return memoryview(self._mm)[offset:offset + length].cast(code)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def string(self, name: str, index: int) -> str:
+        offsets, base = self._strings[name]
+        return self._mm[base + int(offsets[index]):base + int(offsets[index + 1])].decode("utf-8")
+
+    def poi(self, index: int, distance: float = 0.0) -> Poi:
+        """第 index 个 POI"""
+        brand = int(self.brand[index])
+        return Poi(
+            self.string("id", index),
+            self.string("name", index),
+            float(self.lat[index]),
+            float(self.lng[index]),
+            self.string("address", index),
+            self.string("phone", index),
+            brand=self._brand_map[brand] if brand >= 0 else -1,
+            distance=distance
+        )
+
+    def covers(self, lat: float, lng: float, radius: float, type_code: str) -> bool:
+        """查询范围内的网格是否都在快照中完整覆盖"""
+        complete = self.cells.get(type_code)
+        if not complete:
+            return False
+        cells = geohash_cover_box(*bounding_box(lat, lng, radius), self.precision)
+        return len(cells) <= settings.poi_store_max_cells and all(cell in complete for cell in cells)
+
+    def query(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        type_code: str,
+        brands: Optional[List[str]] = None,
+        limit: int = 200
+    ) -> Optional[List[Poi]]:
+        """查询半径内某类 POI，按距离排序；快照未完整覆盖该范围时返回 None"""
+        if not self.covers(lat, lng, radius, type_code):
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        lat_min, lat_max, lng_min, lng_max = bounding_box(lat, lng, radius)
+        divisor = type_divisor(type_code)
+        target = int(type_code) // divisor
+        # 请求的品牌都在快照的品牌表中时，包含这些品牌的名称构建时必然有品牌编号，
+        # 先排除没有品牌的行，再按名称包含精确匹配（名称可能含多个品牌，不能只比较编号）
+        branded_only = bool(brands) and all(brand in self._brand_set for brand in brands)
+
+        if np is not None:
+            lo = int(np.searchsorted(self.lat, lat_min, side="left"))
+            hi = int(np.searchsorted(self.lat, lat_max, side="right"))
+            mask = (self.lng[lo:hi] >= lng_min) & (self.lng[lo:hi] <= lng_max)
+            mask &= (self.type[lo:hi] // divisor) == target
+            if branded_only:
+                mask &= self.brand[lo:hi] >= 0
+            candidates = np.nonzero(mask)[0] + lo
+            lats, lngs = self.lat[candidates], self.lng[candidates]
+        else:
+            lo = bisect_left(self.lat, lat_min)
+            hi = bisect_right(self.lat, lat_max)
+            candidates = [
+                index for index in range(lo, hi)
+                if lng_min <= self.lng[index] <= lng_max
+                and self.type[index] // divisor == target
+                and (not branded_only or self.brand[index] >= 0)
+            ]
+            lats = [self.lat[index] for index in candidates]
+            lngs = [self.lng[index] for index in candidates]
+
+        if len(candidates) == 0:
+            return []
+        distances = to_list(distances_one_to_many(lat, lng, lats, lngs, settings.distance_method))
+        matches = sorted(
+            (distance, int(index)) for distance, index in zip(distances, to_list(candidates))
+            if distance <= radius
+        )
+
+        results = []
+        for distance, index in matches:
+            poi = self.poi(index, distance)
+            if brands and not any(brand in poi.name for brand in brands):
+                continue
+            results.append(poi)
+            if len(results) >= limit:
+                break
+        return results
+
+
+_snapshot: Optional[PoiSnapshot] = None
+_checked_at = 0.0
+
+
+def get_snapshot() -> Optional[PoiSnapshot]:
+    """当前快照，未配置时为 None；文件被替换后自动重新映射"""
+    global _snapshot, _checked_at
+    if not settings.poi_snapshot_file:
+        return None
+
+    now = time.monotonic()
+    if _snapshot is not None and now - _checked_at < settings.poi_snapshot_check_interval:
+        return _snapshot
+    _checked_at = now
+
+    try:
+        mtime = os.stat(settings.poi_snapshot_file).st_mtime
+        if _snapshot is None or mtime != _snapshot.mtime:
+            _snapshot = PoiSnapshot(settings.poi_snapshot_file)
+            print(f"POI 快照已加载: {len(_snapshot)} 个 POI")
+    except FileNotFoundError:
+        _snapshot = None
+    except Exception as e:
+        print(f"POI 快照加载失败: {e}")
+    return _snapshot
+
+
+def load_dump(path: str) -> List[Dict[str, Any]]:
+    """读取高德格式的 POI 导出（JSON 数组或 JSONL）"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main() -> None:
+    from app.services.amap_service import parse_pois
+    from app.services.poi_store import PoiStore
+
+    parser = argparse.ArgumentParser(description="构建 POI 快照")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="从本地 POI 库或高德导出文件构建快照")
+    build_parser.add_argument("--out", required=True)
+    build_parser.add_argument("--store", help="本地 POI 库文件")
+    build_parser.add_argument("--dump", action="append", default=[], help="高德格式的 POI 导出文件，可多次指定")
+    build_parser.add_argument("--type", help="导出文件的类型码（默认取 POI 自带的 typecode）")
+    build_parser.add_argument("--complete", action="store_true", help="导出文件是其范围内该类型的全量数据")
+
+    info_parser = commands.add_parser("info", help="查看快照信息")
+    info_parser.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "info":
+        snapshot = PoiSnapshot(args.path)
+        print(json.dumps({
+            "count": len(snapshot),
+            "precision": snapshot.precision,
+            "built_at": snapshot.built_at,
+            "complete_cells": {type_code: len(cells) for type_code, cells in snapshot.cells.items()},
+        }, ensure_ascii=False))
+        return
+
+    precision = settings.poi_store_cell_precision
+    rows: Dict[str, Tuple[Poi, str]] = {}
+    cells: Dict[str, set] = {}
+
+    if args.store:
+        store = PoiStore(args.store, precision)
+        try:
+            for poi, type_codes in store.export_pois():
+                rows[poi.id] = (poi, most_specific(type_codes))
+            for type_code, type_cells in store.complete_cells().items():
+                cells.setdefault(type_code, set()).update(type_cells)
+        finally:
+            store.close()
+
+    for path in args.dump:
+        raw_pois = load_dump(path)
+        pois = parse_pois(raw_pois)
+        for raw, poi in zip([raw for raw in raw_pois if raw.get("location")], pois):
+            type_code = args.type or str(raw.get("typecode") or "").split("|")[0]
+            if type_code:
+                rows[poi.id] = (poi, type_code)
+        if args.complete and args.type and pois:
+            lats = [poi.lat for poi in pois]
+            lngs = [poi.lng for poi in pois]
+            cells.setdefault(args.type, set()).update(
+                geohash_cells_within(min(lats), max(lats), min(lngs), max(lngs), precision)
+            )
+
+    count = write_snapshot(args.out, rows.values(), {k: sorted(v) for k, v in cells.items()}, precision)
+    print(f"快照已写入 {args.out}: {count} 个 POI")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""地铁站空间索引 - 本地站点数据 + 网格最近邻查询"""
+import asyncio
+import json
+import math
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import get_settings
+from app.services.geo import haversine
+from app.services.amap_service import amap_get
+from app.services.rate_limit import PRIORITY_PREFETCH
+
+settings = get_settings()
+
+# 高德 POI 类型码
+SUBWAY_STATION_TYPE = "150500"
+SUBWAY_EXIT_TYPE = "150501"
+
+METERS_PER_DEGREE = 111320.0
+
+
+class SubwayIndex:
+    """地铁站网格索引
+
+    站点中心和每个出入口都作为索引点存入等经纬度网格，
+    最近邻查询从所在网格向外逐圈扩展，直到剩余网格不可能更近为止。
+    """
+
+    def __init__(self, stations: List[Dict[str, Any]], cell_deg: float = 0.01):
+        self.stations = stations
+        self.cell_deg = cell_deg
+        # 网格 -> [(纬度, 经度, 站点下标, 出入口名称)]
+        self._grid: Dict[Tuple[int, int], List[Tuple[float, float, int, Optional[str]]]] = defaultdict(list)
+
+        for index, station in enumerate(stations):
+            loc = station["location"]
+            self._add_point(loc["lat"], loc["lng"], index, None)
+            for exit_info in station.get("exits") or []:
+                self._add_point(exit_info["lat"], exit_info["lng"], index, exit_info.get("name"))
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def _add_point(self, lat: float, lng: float, index: int, exit_name: Optional[str]) -> None:
+        self._grid[self._cell(lat, lng)].append((lat, lng, index, exit_name))
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def nearest(self, lat: float, lng: float, max_distance: float = 10000) -> Optional[Dict[str, Any]]:
+        """查询最近的地铁站（含出入口），超出 max_distance 时返回 None"""
+        found = self.nearest_point(lat, lng, max_distance)
+        if found is None:
+            return None
+
+        index, exit_name, distance = found
+        station = self.stations[index]
+        lines = station.get("lines") or []
+        return {
+            "name": station["name"],
+            "line": "、".join(lines) if lines else None,
+            "exit": exit_name,
+            "distance": round(distance, 0)
+        }
+
+    def nearest_point(
+        self, lat: float, lng: float, max_distance: float
+    ) -> Optional[Tuple[int, Optional[str], float]]:
+        """返回最近索引点的 (站点下标, 出入口名称, 距离)"""
+        if not self._grid:
+            return None
+
+        # 单个网格在纬度、经度方向上的最短边长（米）
+        cell_m = self.cell_deg * METERS_PER_DEGREE * max(math.cos(math.radians(abs(lat) + self.cell_deg)), 0.01)
+        max_ring = int(max_distance / cell_m) + 1
+        center_row, center_col = self._cell(lat, lng)
+
+        best_distance = float("inf")
+        best: Optional[Tuple[int, Optional[str]]] = None
+
+        for ring in range(max_ring + 1):
+            # 第 ring 圈内的点距离至少为 (ring - 1) 个网格边长
+            if best is not None and (ring - 1) * cell_m > best_distance:
+                break
+
+            for row in range(center_row - ring, center_row + ring + 1):
+                for col in range(center_col - ring, center_col + ring + 1):
+                    if max(abs(row - center_row), abs(col - center_col)) != ring:
+                        continue
+                    for p_lat, p_lng, index, exit_name in self._grid.get((row, col), ()):
+                        distance = haversine(lat, lng, p_lat, p_lng)
+                        if distance < best_distance:
+                            best_distance = distance
+                            best = (index, exit_name)
+
+        if best is None or best_distance > max_distance:
+            return None
+        return best[0], best[1], best_distance
+
+
+_index: Optional[SubwayIndex] = None
+_refresh_task: Optional[asyncio.Task] = None
+
+
+def get_index() -> Optional[SubwayIndex]:
+    """获取当前索引，未加载或为空时返回 None"""
+    if _index is None or len(_index) == 0:
+        return None
+    return _index
+
+
+def set_stations(stations: List[Dict[str, Any]]) -> None:
+    """用新的站点数据重建索引"""
+    global _index
+    _index = SubwayIndex(stations, cell_deg=settings.subway_index_cell_deg)
+
+
+def load_stations(path: str) -> List[Dict[str, Any]]:
+    """从 JSON 文件读取站点数据"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_stations(path: str, stations: List[Dict[str, Any]]) -> None:
+    """原子写入站点数据文件"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stations, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def init_index() -> None:
+    """启动时从文件加载站点数据"""
+    path = settings.subway_stations_file
+    if path and os.path.exists(path):
+        try:
+            set_stations(load_stations(path))
+        except Exception as e:
+            print(f"地铁站数据加载失败: {e}")
+
+
+async def fetch_city_pois(city: str, type_code: str) -> List[Dict[str, Any]]:
+    """按城市分页拉取某类 POI"""
+    results = []
+    page = 1
+    while True:
+        data = await amap_get(
+            "place/text",
+            {
+                "types": type_code,
+                "city": city,
+                "citylimit": "true",
+                "offset": 25,
+                "page": page,
+                "extensions": "base"
+            },
+            PRIORITY_PREFETCH
+        )
+        if data.get("status") != "1":
+            raise RuntimeError(f"高德 API 返回错误: {data.get('info')}")
+
+        pois = data.get("pois") or []
+        results.extend(pois)
+        if len(pois) < 25 or len(results) >= int(data.get("count", 0)):
+            return results
+        page += 1
+
+
+def build_stations(station_pois: List[Dict[str, Any]], exit_pois: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把高德站点和出入口 POI 组装成站点数据"""
+    stations = []
+    for poi in station_pois:
+        loc_str = poi.get("location") or ""
+        if not loc_str:
+            continue
+        lng, lat = map(float, loc_str.split(","))
+        # 地铁站的 address 字段是线路列表，如 "地铁1号线;地铁10号线"
+        address = poi.get("address") or ""
+        lines = [line for line in address.split(";") if line] if isinstance(address, str) else []
+        stations.append({
+            "id": poi.get("id", ""),
+            "name": poi.get("name", ""),
+            "lines": lines,
+            "location": {"lat": lat, "lng": lng},
+            "exits": []
+        })
+
+    if not stations:
+        return stations
+
+    # 出入口归属到最近的站点
+    index = SubwayIndex(stations, cell_deg=settings.subway_index_cell_deg)
+    for poi in exit_pois:
+        loc_str = poi.get("location") or ""
+        if not loc_str:
+            continue
+        lng, lat = map(float, loc_str.split(","))
+        found = index.nearest_point(lat, lng, max_distance=800)
+        if found:
+            stations[found[0]]["exits"].append({"name": poi.get("name", ""), "lat": lat, "lng": lng})
+
+    return stations
+
+
+async def refresh_from_amap(city: str) -> int:
+    """从高德拉取城市全部地铁站并重建索引，返回站点数量"""
+    station_pois = await fetch_city_pois(city, SUBWAY_STATION_TYPE)
+    exit_pois = await fetch_city_pois(city, SUBWAY_EXIT_TYPE)
+    stations = build_stations(station_pois, exit_pois)
+    if not stations:
+        return 0
+
+    set_stations(stations)
+    if settings.subway_stations_file:
+        await asyncio.to_thread(save_stations, settings.subway_stations_file, stations)
+    return len(stations)
+
+
+async def _refresh_loop(city: str, interval: float) -> None:
+    """后台定期刷新"""
+    while True:
+        try:
+            count = await refresh_from_amap(city)
+            print(f"地铁站索引已刷新: {city} {count} 个站点")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"地铁站索引刷新失败: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_background_refresh() -> None:
+    """配置了刷新城市时启动后台刷新任务"""
+    global _refresh_task
+    if settings.subway_refresh_city and any(settings.amap_keys()) and _refresh_task is None:
+        _refresh_task = asyncio.create_task(
+            _refresh_loop(settings.subway_refresh_city, settings.subway_refresh_interval)
+        )
+
+
+async def stop_background_refresh() -> None:
+    """停止后台刷新任务"""
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
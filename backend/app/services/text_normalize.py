@@ -0,0 +1,70 @@
+"""查询文本规范化"""
+import re
+import unicodedata
+
+_CN_DIGITS = {
+    "零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+    "五": 5, "六": 6, "七": 7, "八": 8, "九": 9,
+}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+# 只转换后面跟着量词/单位的中文数字，避免误伤 "一点"、"万达" 之类的词。
+# 必须以中文数字（或十）开头且前面不是阿拉伯数字，"千米" 中的千是单位，不作为数字读入
+_CN_NUMBER_PATTERN = re.compile(
+    r"(?<!\d)[零〇一二两三四五六七八九十](?:[零〇一二两三四五六七八九十百万]|千(?!米))*"
+    r"(?=\s*(?:个|家|间|公里|千米|km|米|m|分钟))"
+)
+# 阿拉伯数字 + 百，如 "5百米" -> "500米"
+_DIGIT_HUNDRED_PATTERN = re.compile(r"(?<![\d.])(\d+)百(?=\s*(?:个|家|间|米|m|分钟))")
+# 整数部分的前导零，不处理小数点后的零（"1.05"）
+_LEADING_ZERO_PATTERN = re.compile(r"(?<![\d.])0+(?=\d)")
+# 规范化规则版本，规则变化时持久化和共享缓存中按旧规则生成的键不再命中
+QUERY_KEY_VERSION = "3"
+# 生成缓存键时去掉不影响查询含义的虚词，只匹配确定是虚词的位置，不拆开 "酒吧"、"网吧"、"的士" 等词：
+#   句首或标点后的礼貌用语（请、麻烦、帮我）
+#   句末或标点前的语气词（吧、呢、呀、啊），排除以其结尾的词（酒吧、网吧、毛呢等）
+#   独立的结构助词 "的"（排除 的士、的确、的哥、目的、打的）
+_FILLER_PATTERNS = [
+    re.compile(r"(?:^|(?<=[\s,.!?;:。、]))(?:请|麻烦|帮我|帮忙)+"),
+    re.compile(
+        r"(?:(?<![酒网水氧书话陶琴清迪球茶奶贴])吧|(?<![毛花线])呢|呀|啊)+(?=[\s,.!?;:~。、]*$|[\s,.!?;:~。、])"
+    ),
+    re.compile(r"(?<![目打])的(?![士确哥])"),
+]
+
+
+def chinese_to_int(text: str) -> int:
+    """中文数字转整数，如 "二十五" -> 25、"一百零五" -> 105"""
+    total = 0
+    section = 0
+    number = 0
+    for char in text:
+        if char in _CN_DIGITS:
+            number = _CN_DIGITS[char]
+        elif char == "万":
+            total += (section + number) * 10000
+            section = 0
+            number = 0
+        else:
+            section += (number or 1) * _CN_UNITS[char]
+            number = 0
+    return total + section + number
+
+
+def canonicalize_text(message: str) -> str:
+    """全角转半角、统一小写、中文数字转阿拉伯数字"""
+    text = unicodedata.normalize("NFKC", message).lower()
+    text = _CN_NUMBER_PATTERN.sub(lambda m: str(chinese_to_int(m.group(0))), text)
+    text = _DIGIT_HUNDRED_PATTERN.sub(lambda m: str(int(m.group(1)) * 100), text)
+    return _LEADING_ZERO_PATTERN.sub("", text)
+
+
+def normalize_query_key(message: str) -> str:
+    """生成缓存用的查询键：在 canonicalize_text 基础上去掉空白、标点和虚词，带规则版本前缀"""
+    text = canonicalize_text(message)
+    for pattern in _FILLER_PATTERNS:
+        text = pattern.sub("", text)
+    return QUERY_KEY_VERSION + ":" + "".join(
+        char for char in text
+        if not unicodedata.category(char).startswith(("P", "Z", "C"))
+    )
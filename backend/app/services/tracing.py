@@ -0,0 +1,339 @@
+"""请求追踪 - 分阶段耗时、Server-Timing 响应头、抽样导出和单请求性能分析
+
+每个请求创建一个 Trace，通过 contextvars 在路由、服务和并发任务之间传递；
+span() 记录一个阶段，嵌套的 span 组成调用树。所有请求都会汇总各阶段耗时写入
+Server-Timing 响应头；按 trace_sample_rate 抽样的请求把完整调用树写入 JSONL 文件
+或以 OTLP/HTTP JSON 格式发送到采集端。
+"""
+import asyncio
+import cProfile
+import functools
+import importlib.util
+import io
+import json
+import pstats
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+from fastapi.routing import APIRoute
+from app.config import get_settings
+from app.services.http_client import get_client
+
+settings = get_settings()
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """一个阶段"""
+
+    __slots__ = ("name", "parent", "start", "end", "attributes")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end = 0.0
+        self.attributes = attributes
+
+
+class Trace:
+    """一次请求的全部阶段"""
+
+    __slots__ = ("name", "sampled", "start", "start_wall_ns", "spans", "endpoint_done_at")
+
+    def __init__(self, name: str, sampled: bool):
+        self.name = name
+        self.sampled = sampled
+        self.start = time.perf_counter()
+        self.start_wall_ns = time.time_ns()
+        self.spans: List[Span] = []
+        self.endpoint_done_at = 0.0
+
+    def server_timing(self) -> str:
+        """按阶段名汇总已结束的 span，生成 Server-Timing 头
+
+        同名嵌套只计最外层；并发的同名 span（如同时发出的多个高德请求）按时间区间的并集计算，
+        各阶段耗时不会超过 total。
+        """
+        intervals: Dict[str, List[Tuple[float, float]]] = {}
+        for item in self.spans:
+            parent = item.parent
+            while parent is not None and parent.name != item.name:
+                parent = parent.parent
+            if parent is None:
+                intervals.setdefault(item.name, []).append((item.start, item.end))
+        totals: Dict[str, float] = {}
+        for name, ranges in intervals.items():
+            ranges.sort()
+            covered = 0.0
+            current_start, current_end = ranges[0]
+            for start, end in ranges[1:]:
+                if start > current_end:
+                    covered += current_end - current_start
+                    current_start, current_end = start, end
+                elif end > current_end:
+                    current_end = end
+            totals[name] = covered + current_end - current_start
+        totals["total"] = time.perf_counter() - self.start
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+    def wall_ns(self, perf: float) -> int:
+        return self.start_wall_ns + int((perf - self.start) * 1e9)
+
+
+def current_trace() -> Optional[Trace]:
+    """当前请求的 Trace，不在请求内时为 None"""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """记录一个阶段，不在请求内时不做任何事"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+
+class TimedRoute(APIRoute):
+    """单独记录响应序列化（响应模型校验和 JSON 编码）耗时的路由"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args, **kwargs):
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    trace = _current_trace.get()
+                    if trace is not None:
+                        trace.endpoint_done_at = time.perf_counter()
+
+            self.dependant.call = timed_endpoint
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            trace = _current_trace.get()
+            if trace is not None and trace.endpoint_done_at:
+                serialize = Span("serialize", None, {})
+                serialize.start = trace.endpoint_done_at
+                serialize.end = time.perf_counter()
+                trace.spans.append(serialize)
+            return response
+
+        return timed_handler
+
+
+def to_records(trace: Trace) -> List[Dict[str, Any]]:
+    """把调用树展开为带 ID 的记录（时间为相对请求开始的毫秒数）"""
+    ids = {id(item): index + 1 for index, item in enumerate(trace.spans)}
+    return [
+        {
+            "id": ids[id(item)],
+            "parent": ids.get(id(item.parent), 0),
+            "name": item.name,
+            "start_ms": round((item.start - trace.start) * 1000, 3),
+            "duration_ms": round((item.end - item.start) * 1000, 3),
+            "attributes": item.attributes,
+        }
+        for item in trace.spans
+    ]
+
+
+def to_otlp(trace: Trace, trace_id: str, end: float) -> Dict[str, Any]:
+    """转换为 OTLP/HTTP JSON 格式"""
+    span_ids = {id(item): f"{random.getrandbits(64):016x}" for item in trace.spans}
+    root_id = f"{random.getrandbits(64):016x}"
+
+    def otlp_span(span_id: str, parent_id: str, name: str, start: float, finish: float, attributes: Dict[str, Any]):
+        return {
+            "traceId": trace_id,
+            "spanId": span_id,
+            "parentSpanId": parent_id,
+            "name": name,
+            "kind": 2 if not parent_id else 1,
+            "startTimeUnixNano": str(trace.wall_ns(start)),
+            "endTimeUnixNano": str(trace.wall_ns(finish)),
+            "attributes": [{"key": key, "value": {"stringValue": str(value)}} for key, value in attributes.items()],
+        }
+
+    spans = [otlp_span(root_id, "", trace.name, trace.start, end, {})]
+    spans.extend(
+        otlp_span(span_ids[id(item)], span_ids.get(id(item.parent), root_id), item.name, item.start, item.end, item.attributes)
+        for item in trace.spans
+    )
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.trace_service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+def _append_line(path: str, line: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+async def export_trace(trace: Trace, status: int) -> None:
+    """导出抽样的 Trace（在后台执行，不阻塞响应）"""
+    end = time.perf_counter()
+    trace_id = f"{random.getrandbits(128):032x}"
+    try:
+        if settings.trace_file:
+            record = {
+                "trace_id": trace_id,
+                "name": trace.name,
+                "status": status,
+                "timestamp": trace.start_wall_ns / 1e9,
+                "duration_ms": round((end - trace.start) * 1000, 3),
+                "spans": to_records(trace),
+            }
+            line = json.dumps(record, ensure_ascii=False, default=str)
+            await asyncio.get_running_loop().run_in_executor(None, _append_line, settings.trace_file, line)
+        if settings.trace_otlp_endpoint:
+            response = await get_client("otlp").post(settings.trace_otlp_endpoint, json=to_otlp(trace, trace_id, end))
+            if response.status_code >= 300:
+                print(f"Trace 导出失败: HTTP {response.status_code}")
+    except Exception as e:
+        print(f"Trace 导出失败: {e}")
+
+
+def profiler_available() -> str:
+    """可用的性能分析器：优先 pyinstrument（能正确展示 async 调用栈），否则 cProfile"""
+    return "pyinstrument" if importlib.util.find_spec("pyinstrument") is not None else "cprofile"
+
+
+class _Profiler:
+    """单请求性能分析（同一时间只允许一个）
+
+    分析器作用于整个事件循环线程，并发处理的其他请求也会出现在报告中。
+    """
+
+    active = False
+
+    def __init__(self):
+        self.kind = profiler_available()
+        if self.kind == "pyinstrument":
+            from pyinstrument import Profiler
+            self._profiler = Profiler(async_mode="enabled")
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self) -> None:
+        _Profiler.active = True
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> str:
+        _Profiler.active = False
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True)
+
+        self._profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(settings.profile_top_n)
+        return output.getvalue()
+
+
+class TracingMiddleware:
+    """为每个请求创建 Trace，写入 Server-Timing 响应头，导出抽样的 Trace
+
+    开启 profiling_enabled 后，请求带 ?profile=1 时对该请求做性能分析，
+    响应替换为纯文本分析报告。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._exports = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if settings.profiling_enabled and b"profile" in scope["query_string"]:
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            if query.get("profile", ["0"])[0] not in ("", "0", "false"):
+                await self._profile(scope, receive, send)
+                return
+
+        sampled = settings.trace_sample_rate > 0 and random.random() < settings.trace_sample_rate
+        trace = Trace(f"{scope['method']} {scope['path']}", sampled)
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing_enabled:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            if trace.sampled:
+                task = asyncio.ensure_future(export_trace(trace, status))
+                self._exports.add(task)
+                task.add_done_callback(self._exports.discard)
+
+    async def _profile(self, scope, receive, send) -> None:
+        """分析一个请求，返回分析报告"""
+        if _Profiler.active:
+            body = "已有请求在做性能分析，请稍后再试".encode("utf-8")
+            status = 409
+        else:
+            profiler = _Profiler()
+            trace = Trace(f"{scope['method']} {scope['path']}", False)
+            token = _current_trace.set(trace)
+            upstream_status = 500
+
+            async def capture(message):
+                nonlocal upstream_status
+                if message["type"] == "http.response.start":
+                    upstream_status = message["status"]
+
+            profiler.start()
+            try:
+                await self.app(scope, receive, capture)
+            finally:
+                report = profiler.stop()
+                _current_trace.reset(token)
+
+            header = f"# {trace.name} -> {upstream_status}\n# Server-Timing: {trace.server_timing()}\n\n"
+            body = (header + report).encode("utf-8")
+            status = 200
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
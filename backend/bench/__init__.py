@@ -0,0 +1 @@
+"""本地压测工具 - 模拟上游服务与负载生成器"""
@@ -0,0 +1,222 @@
+"""负载生成器 - 按目标 RPS 压测后端接口，输出 JSON 报告
+
+    python -m bench.load_test --base-url http://127.0.0.1:8000 --rps 50 --duration 30
+
+开环发压：请求按固定间隔发出，不等待前一个请求返回；延迟从计划发出时间算起，
+因此客户端排队也计入延迟，避免协调遗漏（coordinated omission）掩盖尾延迟。
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+
+# 热点位置（北京），用户位置在其附近随机偏移，使缓存命中率接近真实流量
+HOTSPOTS = [
+    (39.9087, 116.3975),  # 天安门
+    (39.9219, 116.4436),  # 三里屯
+    (39.9834, 116.3162),  # 中关村
+    (39.9996, 116.4741),  # 望京
+    (39.9075, 116.4594),  # 国贸
+]
+
+MESSAGES = [
+    "我要找附近5公里内离地铁站口最近的3个知名经济型连锁酒店门店",
+    "附近的星巴克",
+    "最近的便利店",
+    "2公里内评分最高的川菜馆",
+    "附近有什么商场",
+    "找一家离地铁近的如家或者汉庭",
+    "附近的药店",
+    "500米内的咖啡厅",
+]
+
+SEARCHES = [
+    {"category": "酒店", "brands": ["如家", "汉庭"], "sort_by": "距离地铁站最近", "proximity": "地铁站", "limit": 3},
+    {"category": "咖啡厅", "limit": 10},
+    {"category": "便利店", "radius": 1000, "limit": 5},
+    {"category": "餐饮", "subcategory": "川菜", "limit": 10},
+    {"category": "商场", "radius": 3000},
+]
+
+
+def random_location(rng: random.Random, spread: float = 0.01) -> Dict[str, float]:
+    """热点附近的随机位置（spread 度，约 1 公里）"""
+    lat, lng = rng.choice(HOTSPOTS)
+    return {"lat": lat + rng.uniform(-spread, spread), "lng": lng + rng.uniform(-spread, spread)}
+
+
+def parse_request(rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    return "/api/parse-query", {"message": rng.choice(MESSAGES), "location": random_location(rng)}
+
+
+def query_request(rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    return "/api/query", {"message": rng.choice(MESSAGES), "location": random_location(rng)}
+
+
+def search_request(rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    return "/api/search", {**rng.choice(SEARCHES), "location": random_location(rng)}
+
+
+def route_request(rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    origin = random_location(rng)
+    return "/api/route", {
+        "origin": origin,
+        "destination": random_location(rng, spread=0.02),
+        "mode": rng.choice(["walking", "walking", "driving"]),
+    }
+
+
+# 接口名称 -> 请求生成函数
+SCENARIOS: Dict[str, Callable[[random.Random], Tuple[str, Dict[str, Any]]]] = {
+    "parse": parse_request,
+    "query": query_request,
+    "search": search_request,
+    "route": route_request,
+}
+
+
+def parse_mix(value: str) -> List[Tuple[str, float]]:
+    """解析 "parse=1,search=2,route=1" 格式的流量配比"""
+    mix = []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"未知接口: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """最近秩法分位数"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(q * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """汇总一组请求的延迟（毫秒）、吞吐和错误率"""
+    values = sorted(latencies)
+    total = len(values)
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput": round((total - errors) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(values) / total) if total else None,
+            "p50": ms(percentile(values, 0.50)),
+            "p95": ms(percentile(values, 0.95)),
+            "p99": ms(percentile(values, 0.99)),
+            "max": ms(values[-1]) if values else None,
+        },
+    }
+
+
+async def run_load(
+    base_url: str,
+    rps: float,
+    duration: float,
+    mix: List[Tuple[str, float]],
+    timeout: float = 30.0,
+    max_in_flight: int = 1000,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """按目标 RPS 发压 duration 秒，返回报告"""
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    results: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    statuses: Dict[str, int] = {}
+    dropped = 0
+    in_flight = set()
+
+    async def fire(client: httpx.AsyncClient, name: str, scheduled_at: float) -> None:
+        path, payload = SCENARIOS[name](rng)
+        status = "exception"
+        try:
+            response = await client.post(path, json=payload)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        finally:
+            results[name].append(time.perf_counter() - scheduled_at)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status != "200":
+                errors[name] += 1
+
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started_at = time.perf_counter()
+        total = int(rps * duration)
+        for index in range(total):
+            scheduled_at = started_at + index / rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                # 被测服务已无法跟上，丢弃本次请求并计数
+                dropped += 1
+                continue
+            name = rng.choices(names, weights)[0]
+            task = asyncio.create_task(fire(client, name, scheduled_at))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+        elapsed = time.perf_counter() - started_at
+
+    all_latencies = [value for values in results.values() for value in values]
+    return {
+        "config": {"base_url": base_url, "rps": rps, "duration": duration, "mix": dict(mix)},
+        "elapsed": round(elapsed, 2),
+        "dropped": dropped,
+        "statuses": statuses,
+        "overall": summarize(all_latencies, sum(errors.values()), elapsed),
+        "endpoints": {name: summarize(results[name], errors[name], elapsed) for name in names},
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="后端接口负载测试")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=20.0, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=30.0, help="发压时长（秒）")
+    parser.add_argument("--mix", default="parse=1,search=2,route=1", help="流量配比，可选 parse/query/search/route")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="", help="报告输出文件，默认打印到标准输出")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    report = asyncio.run(run_load(
+        base_url=args.base_url,
+        rps=args.rps,
+        duration=args.duration,
+        mix=parse_mix(args.mix),
+        timeout=args.timeout,
+        max_in_flight=args.max_in_flight,
+        seed=args.seed
+    ))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
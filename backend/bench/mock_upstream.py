@@ -0,0 +1,402 @@
+"""模拟上游服务 - 离线模拟高德 Web 服务和 LLM 接口
+
+    python -m bench.mock_upstream --port 9000 --amap-latency 60:300 --llm-latency 1200:5000
+
+路径前缀：
+    /v3/...                 高德（place/around、place/text、place/polygon、direction/*、distance）
+    /siliconflow/v1/...     SiliconFlow chat/completions
+    /dashscope/api/v1/...   DashScope text-generation
+    /openai/v1/...          OpenAI chat/completions
+    /v1/traces              OTLP/HTTP JSON 采集端替身（TRACE_OTLP_ENDPOINT）
+
+延迟按对数正态分布采样，用 "中位数:p99"（毫秒）描述；错误率为返回 HTTP 500 的比例，
+限流率为返回高德 QPS 超限（infocode 10004）的比例。相同参数的搜索返回相同结果，便于缓存生效。
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.services.geo import haversine
+from app.services.lexicon import lexicon, BRAND_DATABASE
+
+# 标准正态分布的 99 分位数
+_Z99 = 2.326
+
+# 类型编码 -> 名称前缀
+TYPE_NAMES = {
+    "100000": BRAND_DATABASE["酒店"],
+    "050000": ["老北京炸酱面", "海底捞", "西贝莜面村", "外婆家", "眉州东坡"] + BRAND_DATABASE["快餐"],
+    "050500": BRAND_DATABASE["咖啡"],
+    "060100": BRAND_DATABASE["便利店"],
+    "150500": ["地铁站"],
+    "060000": ["万达广场", "大悦城", "银泰百货", "龙湖天街"],
+    "060200": ["物美", "沃尔玛", "永辉超市", "盒马鲜生"],
+    "160100": ["工商银行", "建设银行", "招商银行", "农业银行"],
+    "090000": ["社区卫生服务中心", "人民医院", "中医医院"],
+    "090600": ["同仁堂", "老百姓大药房", "金象大药房"],
+}
+
+ROADS = ["建国路", "长安街", "朝阳路", "东三环中路", "中关村大街", "学院路", "望京街", "三里屯路"]
+DISTRICTS = ["朝阳区", "海淀区", "东城区", "西城区", "丰台区"]
+
+
+class Profile:
+    """单个上游的模拟参数"""
+
+    def __init__(self, median_ms: float, p99_ms: float, error_rate: float = 0.0, throttle_rate: float = 0.0):
+        self.mu = math.log(max(median_ms, 0.01) / 1000)
+        self.sigma = max(math.log(max(p99_ms, median_ms) / max(median_ms, 0.01)) / _Z99, 0.0)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+    def latency(self) -> float:
+        """采样一次延迟（秒）"""
+        return random.lognormvariate(self.mu, self.sigma)
+
+    async def outcome(self) -> str:
+        """等待模拟延迟后决定结果：ok / error / throttled"""
+        await asyncio.sleep(self.latency())
+        roll = random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.throttle_rate:
+            return "throttled"
+        return "ok"
+
+
+def parse_latency(value: str) -> Tuple[float, float]:
+    """解析 "中位数:p99" 格式的延迟参数（毫秒）"""
+    median, _, p99 = value.partition(":")
+    return float(median), float(p99 or median)
+
+
+def seeded_random(*parts: Any) -> random.Random:
+    """按请求参数生成确定性的随机数源"""
+    return random.Random(zlib.crc32("|".join(str(part) for part in parts).encode("utf-8")))
+
+
+def offset_point(lat: float, lng: float, distance: float, bearing: float) -> Tuple[float, float]:
+    """从某点沿方位角移动一段距离（米）"""
+    dlat = distance * math.cos(bearing) / 111320
+    dlng = distance * math.sin(bearing) / (111320 * math.cos(math.radians(lat)))
+    return lat + dlat, lng + dlng
+
+
+def make_poi(
+    rng: random.Random,
+    center: Tuple[float, float],
+    radius: float,
+    type_code: str,
+    index: int,
+    keywords: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """生成一条字段齐全（extensions=all）的 POI，按请求参数由 project 裁剪
+
+    指定关键词时名称取自关键词，靠前的关键词更密集（权重 1/n²），模拟多品牌查询被某一品牌占满。
+    """
+    # 面积均匀分布
+    distance = radius * math.sqrt(rng.random())
+    lat, lng = offset_point(center[0], center[1], distance, rng.uniform(0, 2 * math.pi))
+    road = rng.choice(ROADS)
+    if keywords:
+        brand = rng.choices(keywords, weights=[1 / (rank + 1) ** 2 for rank in range(len(keywords))])[0]
+    else:
+        brand = rng.choice(TYPE_NAMES.get(type_code, ["商户"]))
+    name = f"{brand}({road}{rng.choice(['店', '分店', '旗舰店'])})"
+    if type_code == "150500":
+        name = f"{road}站"
+    return {
+        "id": f"B0FF{zlib.crc32(f'{lat:.6f},{lng:.6f}'.encode()):08X}",
+        "parent": [],
+        "name": name,
+        "type": "生活服务;生活服务场所;生活服务场所",
+        "typecode": type_code,
+        "biz_type": [],
+        "address": f"{road}{rng.randint(1, 300)}号",
+        "location": f"{lng:.6f},{lat:.6f}",
+        "tel": f"010-{rng.randint(10000000, 99999999)}",
+        "distance": str(int(distance)),
+        "pname": "北京市",
+        "cityname": "北京市",
+        "adname": rng.choice(DISTRICTS),
+        "business_area": rng.choice(["国贸", "三里屯", "中关村", "望京", "西单"]),
+        "biz_ext": {"rating": f"{rng.uniform(3.5, 5):.1f}", "cost": str(rng.randint(20, 600))},
+        "photos": [
+            {"title": [], "url": f"http://store.is.autonavi.com/showpic/{rng.getrandbits(64):016x}"}
+            for _ in range(rng.randint(1, 3))
+        ],
+        "index": index,
+    }
+
+
+# extensions=base 返回的字段，其余（biz_ext、照片等）只在 extensions=all 时返回
+BASE_FIELDS = ("id", "parent", "name", "type", "typecode", "address", "location", "tel", "distance", "pname", "cityname", "adname")
+
+
+def project(pois: List[Dict[str, Any]], extensions: Optional[str]) -> List[Dict[str, Any]]:
+    """按 extensions 参数裁剪 POI 字段"""
+    if extensions == "all":
+        return pois
+    return [{field: poi[field] for field in BASE_FIELDS if field in poi} for poi in pois]
+
+
+def make_pois(params: Dict[str, str], total: int) -> Tuple[List[Dict[str, Any]], int]:
+    """按分页参数生成周边搜索结果"""
+    lng, lat = map(float, params.get("location", "116.397,39.909").split(","))
+    radius = float(params.get("radius", 5000))
+    type_code = params.get("types", "050000").split("|")[0]
+    offset = int(params.get("offset", 20))
+    page = int(params.get("page", 1))
+    rng = seeded_random(params.get("location"), radius, type_code, params.get("keywords", ""))
+    count = rng.randint(total // 2, total)
+    keywords = [keyword for keyword in params.get("keywords", "").split("|") if keyword]
+    pois = [make_poi(rng, (lat, lng), radius, type_code, index, keywords) for index in range(count)]
+    pois.sort(key=lambda poi: int(poi["distance"]))
+    return project(pois[(page - 1) * offset:page * offset], params.get("extensions")), count
+
+
+def make_steps(origin: Tuple[float, float], destination: Tuple[float, float], distance: float, speed: float) -> List[Dict[str, Any]]:
+    """按距离生成路线步骤"""
+    count = max(1, min(int(distance / 300) + 1, 25))
+    steps = []
+    for index in range(count):
+        part = distance / count
+        steps.append({
+            "instruction": f"沿{ROADS[index % len(ROADS)]}向{['东', '南', '西', '北'][index % 4]}步行{int(part)}米",
+            "orientation": "东",
+            "road": ROADS[index % len(ROADS)],
+            "distance": str(int(part)),
+            "duration": str(int(part / speed)),
+            "polyline": ";".join(
+                f"{origin[1] + (destination[1] - origin[1]) * (index + k / 4) / count:.6f},"
+                f"{origin[0] + (destination[0] - origin[0]) * (index + k / 4) / count:.6f}"
+                for k in range(5)
+            ),
+            "action": "直行",
+            "assistant_action": [],
+        })
+    return steps
+
+
+def parse_point(value: str) -> Tuple[float, float]:
+    """"lng,lat" -> (lat, lng)"""
+    lng, lat = map(float, value.split(","))
+    return lat, lng
+
+
+def mock_parse(message: str) -> str:
+    """模拟模型输出：思考过程 + JSON"""
+    extracted = lexicon.extract(message)
+    result = {
+        "category": extracted["category"] or "餐饮",
+        "subcategory": extracted["subcategory"],
+        "radius": extracted["radius"] or 5000,
+        "limit": extracted["limit"] or 10,
+        "sort_by": "距离地铁站最近" if extracted["near_subway"] else None,
+        "brands": extracted["brands"] or None,
+        "proximity": "地铁站" if extracted["near_subway"] else None,
+    }
+    thinking = "用户想要查找附近的地点，我需要提取类型、范围、数量和排序方式。" * 8
+    return f"<think>{thinking}</think>\n```json\n{json.dumps(result, ensure_ascii=False, indent=2)}\n```"
+
+
+def create_app(
+    amap: Profile,
+    llm: Profile,
+    pois_per_query: int = 60
+) -> FastAPI:
+    """创建模拟上游应用"""
+    app = FastAPI(title="Mock Upstream")
+    app.state.calls = {}
+
+    def count(name: str) -> None:
+        app.state.calls[name] = app.state.calls.get(name, 0) + 1
+
+    async def amap_outcome(name: str):
+        """高德公共处理：延迟、HTTP 错误和限流，正常时返回 None"""
+        count(name)
+        outcome = await amap.outcome()
+        if outcome == "error":
+            return JSONResponse({"status": "0", "info": "SERVICE_NOT_AVAILABLE"}, status_code=500)
+        if outcome == "throttled":
+            return JSONResponse({"status": "0", "info": "CUQPS_HAS_EXCEEDED_THE_LIMIT", "infocode": "10004"})
+        return None
+
+    @app.get("/v3/place/around")
+    async def place_around(request: Request):
+        failed = await amap_outcome("place/around")
+        if failed is not None:
+            return failed
+        pois, total = make_pois(dict(request.query_params), pois_per_query)
+        return {"status": "1", "info": "OK", "infocode": "10000", "count": str(total), "pois": pois}
+
+    @app.get("/v3/place/text")
+    async def place_text(request: Request):
+        failed = await amap_outcome("place/text")
+        if failed is not None:
+            return failed
+        params = dict(request.query_params)
+        params["location"] = "116.397428,39.90923"
+        params["radius"] = "20000"
+        pois, total = make_pois(params, pois_per_query * 4)
+        return {"status": "1", "info": "OK", "infocode": "10000", "count": str(total), "pois": pois}
+
+    @app.get("/v3/place/polygon")
+    async def place_polygon(request: Request):
+        failed = await amap_outcome("place/polygon")
+        if failed is not None:
+            return failed
+        params = dict(request.query_params)
+        (lat1, lng1), (lat2, lng2) = [parse_point(point) for point in params["polygon"].split("|")[:2]]
+        center = ((lat1 + lat2) / 2, (lng1 + lng2) / 2)
+        half_diagonal = haversine(lat1, lng1, lat2, lng2) / 2
+        offset = int(params.get("offset", 20))
+        page = int(params.get("page", 1))
+        pois, _ = make_pois(
+            {**params, "location": f"{center[1]:.6f},{center[0]:.6f}", "radius": str(half_diagonal), "page": "1", "offset": "100000"},
+            max(pois_per_query // 4, 1)
+        )
+        inside = [
+            poi for poi in pois
+            if min(lat1, lat2) <= parse_point(poi["location"])[0] <= max(lat1, lat2)
+            and min(lng1, lng2) <= parse_point(poi["location"])[1] <= max(lng1, lng2)
+        ]
+        return {
+            "status": "1", "info": "OK", "infocode": "10000", "count": str(len(inside)),
+            "pois": inside[(page - 1) * offset:page * offset],
+        }
+
+    @app.get("/v3/direction/{mode}")
+    async def direction(mode: str, request: Request):
+        failed = await amap_outcome(f"direction/{mode}")
+        if failed is not None:
+            return failed
+        origin = parse_point(request.query_params["origin"])
+        destination = parse_point(request.query_params["destination"])
+        distance = haversine(origin[0], origin[1], destination[0], destination[1]) * 1.3
+        speed = 10.0 if mode == "driving" else 1.2
+        return {
+            "status": "1", "info": "OK", "infocode": "10000", "count": "1",
+            "route": {
+                "origin": request.query_params["origin"],
+                "destination": request.query_params["destination"],
+                "paths": [{
+                    "distance": str(int(distance)),
+                    "duration": str(int(distance / speed)),
+                    "steps": make_steps(origin, destination, distance, speed),
+                }],
+            },
+        }
+
+    @app.get("/v3/distance")
+    async def distance(request: Request):
+        failed = await amap_outcome("distance")
+        if failed is not None:
+            return failed
+        destination = parse_point(request.query_params["destination"])
+        results = []
+        for index, value in enumerate(request.query_params["origins"].split("|")):
+            origin = parse_point(value)
+            meters = haversine(origin[0], origin[1], destination[0], destination[1]) * 1.3
+            results.append({
+                "origin_id": str(index + 1), "dest_id": "1",
+                "distance": str(int(meters)), "duration": str(int(meters / 1.2)),
+            })
+        return {"status": "1", "info": "OK", "infocode": "10000", "count": str(len(results)), "results": results}
+
+    async def llm_content(name: str, request: Request):
+        """LLM 公共处理，返回 (用户消息, 失败响应)"""
+        count(name)
+        body = await request.json()
+        messages = body.get("messages") or body.get("input", {}).get("messages") or []
+        message = messages[-1]["content"] if messages else ""
+        outcome = await llm.outcome()
+        if outcome != "ok":
+            status = 500 if outcome == "error" else 429
+            return message, JSONResponse({"error": {"message": outcome}}, status_code=status)
+        return message.split("\n")[0].removeprefix("用户查询："), None
+
+    def chat_completion(content: str) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-{random.getrandbits(64):016x}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "mock",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 420, "completion_tokens": 180, "total_tokens": 600},
+        }
+
+    @app.post("/siliconflow/v1/chat/completions")
+    async def siliconflow(request: Request):
+        message, failed = await llm_content("siliconflow", request)
+        return failed or chat_completion(mock_parse(message))
+
+    @app.post("/openai/v1/chat/completions")
+    async def openai(request: Request):
+        message, failed = await llm_content("openai", request)
+        return failed or chat_completion(mock_parse(message))
+
+    @app.post("/dashscope/api/v1/services/aigc/text-generation/generation")
+    async def dashscope(request: Request):
+        message, failed = await llm_content("dashscope", request)
+        if failed is not None:
+            return failed
+        return {
+            "output": {"choices": [{"finish_reason": "stop", "message": {"role": "assistant", "content": mock_parse(message)}}]},
+            "usage": {"input_tokens": 420, "output_tokens": 180},
+            "request_id": f"{random.getrandbits(64):016x}",
+        }
+
+    @app.post("/v1/traces")
+    async def traces(request: Request):
+        """OTLP/HTTP JSON 采集端替身，只统计收到的 span 数"""
+        body = await request.json()
+        for resource in body.get("resourceSpans", []):
+            for scope in resource.get("scopeSpans", []):
+                app.state.calls["otlp_spans"] = app.state.calls.get("otlp_spans", 0) + len(scope.get("spans", []))
+        count("otlp")
+        return {}
+
+    @app.get("/stats")
+    async def stats():
+        """各接口被调用次数"""
+        return app.state.calls
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="模拟高德和 LLM 上游服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--amap-latency", default="60:300", help="高德延迟 中位数:p99（毫秒）")
+    parser.add_argument("--amap-error-rate", type=float, default=0.0)
+    parser.add_argument("--amap-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", default="1200:5000", help="LLM 延迟 中位数:p99（毫秒）")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--pois", type=int, default=60, help="每次周边搜索的最大结果总数")
+    parser.add_argument("--seed", type=int, default=None, help="延迟和错误的随机种子")
+    return parser
+
+
+def main() -> None:
+    import uvicorn
+
+    args = build_parser().parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    app = create_app(
+        amap=Profile(*parse_latency(args.amap_latency), args.amap_error_rate, args.amap_throttle_rate),
+        llm=Profile(*parse_latency(args.llm_latency), args.llm_error_rate),
+        pois_per_query=args.pois
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
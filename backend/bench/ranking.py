@@ -0,0 +1,99 @@
+"""排序基准 - 对比改造前的全量排序与加权评分 + 堆选 top-k
+
+    python -m bench.ranking --sizes 50,200,1000 --k 10 --repeat 500
+
+    full      改造前：按距离（或旧的综合分）对全部候选完整排序后截取前 k 个
+    top_k     scoring.top_k：单项按排序键堆选；多项批量计算加权和后 argpartition 选出 k 个再排序
+
+候选按距离有序生成，distance 一项对完整排序最有利（Timsort 对有序输入为线性），rating 一项输入无序。
+"""
+import argparse
+import json
+import random
+import time
+from operator import attrgetter
+from typing import Any, Callable, Dict, List
+from app.services.geo import np
+from app.services.poi import Poi, BRANDS
+from app.services.scoring import SORT_MODES, DEFAULT_WEIGHTS, SORT_KEYS, top_k
+
+
+def sample_pois(count: int, seed: int = 7) -> List[Poi]:
+    rng = random.Random(seed)
+    pois = []
+    for index in range(count):
+        brand = rng.randrange(-1, len(BRANDS))
+        name = f"{BRANDS[brand]}(国贸{index}店)" if brand >= 0 else f"小店{index}"
+        poi = Poi(
+            f"B000A{index:05d}", name, 39.9 + rng.random() * 0.05, 116.4 + rng.random() * 0.05,
+            rating=round(rng.uniform(3.0, 5.0), 1) if rng.random() < 0.8 else None,
+            cost=float(rng.randrange(20, 500)) if rng.random() < 0.7 else None,
+            distance=float(rng.randrange(50, 5000))
+        )
+        poi.subway = {"name": "国贸", "line": None, "exit": None, "distance": float(rng.randrange(100, 3000))}
+        pois.append(poi)
+    pois.sort(key=attrgetter("distance"))
+    return pois
+
+
+def legacy_score(poi: Poi) -> float:
+    """改造前的 calculate_score：距离和地铁站距离的线性组合"""
+    score = max(0, 100 - poi.distance / 100) * 0.6
+    if poi.subway:
+        score += max(0, 100 - poi.subway["distance"] / 10) * 0.4
+    return score
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """单次调用耗时（微秒），取 5 轮中最快的一轮"""
+    func()
+    best = float("inf")
+    for _ in range(5):
+        started_at = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        best = min(best, (time.perf_counter() - started_at) / repeat)
+    return best * 1e6
+
+
+def run_bench(sizes: List[int], k: int, repeat: int) -> Dict[str, Any]:
+    composite = dict(SORT_MODES)["综合"]
+    report: Dict[str, Any] = {"config": {"k": k, "repeat": repeat, "numpy": np is not None}}
+    for size in sizes:
+        pois = sample_pois(size)
+        cases = {
+            "distance": (
+                lambda: sorted(pois, key=attrgetter("distance"))[:k],
+                lambda: top_k(pois, DEFAULT_WEIGHTS, k)
+            ),
+            "rating": (
+                lambda: sorted(pois, key=SORT_KEYS["rating"])[:k],
+                lambda: top_k(pois, {"rating": 1.0}, k)
+            ),
+            "composite": (
+                lambda: sorted(pois, key=legacy_score, reverse=True)[:k],
+                lambda: top_k(pois, composite, k)
+            ),
+        }
+        report[str(size)] = {
+            name: {
+                "full_us": round(measure(full, repeat), 1),
+                "top_k_us": round(measure(heap, repeat), 1),
+            }
+            for name, (full, heap) in cases.items()
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="排序基准")
+    parser.add_argument("--sizes", default="50,200,1000", help="候选数量（逗号分隔）")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    print(json.dumps(run_bench(sizes, args.k, args.repeat), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
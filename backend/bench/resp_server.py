@@ -0,0 +1,168 @@
+"""Redis 协议替身 - 本地测试共享缓存的 redis 后端，无需安装 Redis
+
+    python -m bench.resp_server --port 6380 --max-keys 100000
+    SHARED_CACHE_BACKEND=redis SHARED_CACHE_REDIS_URL=redis://127.0.0.1:6380/0
+
+支持 PING、GET、SET（EX/PX/NX/XX）、DEL、EXISTS、DBSIZE、FLUSHDB/FLUSHALL、SELECT、AUTH，
+按 --max-keys 做 LRU 淘汰（相当于 maxmemory-policy allkeys-lru）。只有一个库，SELECT 和 AUTH 总是成功。
+"""
+import argparse
+import asyncio
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+class Store:
+    """带过期时间的 LRU 字典"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._data: "OrderedDict[bytes, Tuple[bytes, float]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: bytes, value: bytes, ttl: float = 0.0) -> None:
+        self._data[key] = (value, time.monotonic() + ttl if ttl else 0.0)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: bytes) -> int:
+        return 1 if self._data.pop(key, None) is not None else 0
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def simple(text: str) -> bytes:
+    return b"+" + text.encode() + b"\r\n"
+
+
+def error(text: str) -> bytes:
+    return b"-ERR " + text.encode() + b"\r\n"
+
+
+def integer(value: int) -> bytes:
+    return b":%d\r\n" % value
+
+
+def bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def handle(store: Store, args: List[bytes]) -> bytes:
+    """执行一条命令，返回 RESP 编码的响应"""
+    command = args[0].upper()
+    if command == b"PING":
+        return bulk(args[1]) if len(args) > 1 else simple("PONG")
+    if command == b"GET" and len(args) == 2:
+        return bulk(store.get(args[1]))
+    if command == b"SET" and len(args) >= 3:
+        ttl, nx, xx = 0.0, False, False
+        options = [arg.upper() for arg in args[3:]]
+        index = 0
+        while index < len(options):
+            option = options[index]
+            if option in (b"EX", b"PX") and index + 1 < len(options):
+                ttl = int(options[index + 1]) / (1 if option == b"EX" else 1000)
+                index += 2
+                continue
+            if option == b"NX":
+                nx = True
+            elif option == b"XX":
+                xx = True
+            else:
+                return error("syntax error")
+            index += 1
+        exists = store.get(args[1]) is not None
+        if (nx and exists) or (xx and not exists):
+            return bulk(None)
+        store.set(args[1], args[2], ttl)
+        return simple("OK")
+    if command == b"DEL" and len(args) >= 2:
+        return integer(sum(store.delete(key) for key in args[1:]))
+    if command == b"EXISTS" and len(args) >= 2:
+        return integer(sum(store.get(key) is not None for key in args[1:]))
+    if command == b"DBSIZE":
+        return integer(len(store))
+    if command in (b"FLUSHDB", b"FLUSHALL"):
+        store.clear()
+        return simple("OK")
+    if command in (b"SELECT", b"AUTH"):
+        return simple("OK")
+    return error(f"unknown command '{args[0].decode(errors='replace')}'")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    """读取一条 RESP 数组命令，连接关闭时返回 None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # 内联命令（如 redis-cli 之外的 telnet 调试）
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        length = int(header[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def make_handler(store: Store):
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if args:
+                    writer.write(handle(store, args))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return serve
+
+
+async def run(host: str, port: int, max_keys: int) -> None:
+    store = Store(max_keys)
+    server = await asyncio.start_server(make_handler(store), host, port)
+    print(f"RESP 替身已启动: {host}:{port}（最多 {max_keys} 个键）")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis 协议替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--max-keys", type=int, default=100000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.host, args.port, args.max_keys))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
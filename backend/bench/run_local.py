@@ -0,0 +1,108 @@
+"""一键本地压测 - 启动模拟上游和后端，发压后输出报告，无需任何 API Key
+
+    python -m bench.run_local --rps 50 --duration 30 --mix parse=1,search=2,route=1
+    python -m bench.run_local --workers 4 --shared-cache redis
+
+模拟上游参数（--amap-latency 等）原样传给 bench.mock_upstream。
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+from bench.load_test import run_load, parse_mix
+
+
+def wait_ready(url: str, timeout: float = 20.0) -> None:
+    """等待服务可以响应"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"服务未能启动: {url}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="启动模拟上游和后端并压测")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", default="parse=1,search=2,route=1")
+    parser.add_argument("--mock-port", type=int, default=9000)
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--amap-qps", type=float, default=1000.0, help="后端每个高德 Key 的 QPS 上限（真实 Key 通常为 20）")
+    parser.add_argument("--workers", type=int, default=1, help="后端 worker 进程数")
+    parser.add_argument("--shared-cache", choices=["", "sqlite", "redis"], default="", help="跨 worker 共享缓存后端")
+    parser.add_argument("--resp-port", type=int, default=6380, help="--shared-cache redis 时启动的 RESP 替身端口")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="")
+    args, mock_args = parser.parse_known_args()
+
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    env = {
+        **os.environ,
+        "AMAP_API_KEY": "mock",
+        "AMAP_API_KEYS": "",
+        "AMAP_BASE_URL": f"{mock_url}/v3",
+        "AMAP_QPS_PER_KEY": str(args.amap_qps),
+        "SILICONFLOW_API_KEY": "mock",
+        "SILICONFLOW_BASE_URL": f"{mock_url}/siliconflow/v1",
+        "DASHSCOPE_API_KEY": "mock",
+        "DASHSCOPE_BASE_URL": f"{mock_url}/dashscope/api/v1",
+        "OPENAI_API_KEY": "",
+        "SUBWAY_REFRESH_CITY": "",
+        "PARSE_CACHE_FILE": "",
+        "SHARED_CACHE_BACKEND": args.shared_cache,
+        "SHARED_CACHE_FILE": "bench_shared_cache.db",
+        "SHARED_CACHE_REDIS_URL": f"redis://127.0.0.1:{args.resp_port}/0",
+    }
+
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "bench.mock_upstream", "--port", str(args.mock_port)] + mock_args,
+            env=env
+        ),
+        subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.app_port),
+                "--workers", str(args.workers), "--log-level", "warning"
+            ],
+            env=env
+        ),
+    ]
+    if args.shared_cache == "redis":
+        processes.insert(0, subprocess.Popen(
+            [sys.executable, "-m", "bench.resp_server", "--port", str(args.resp_port)], env=env
+        ))
+    try:
+        wait_ready(f"{mock_url}/stats")
+        wait_ready(f"{app_url}/health")
+        report = asyncio.run(run_load(
+            base_url=app_url,
+            rps=args.rps,
+            duration=args.duration,
+            mix=parse_mix(args.mix),
+            seed=args.seed
+        ))
+        report["upstream_calls"] = httpx.get(f"{mock_url}/stats").json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
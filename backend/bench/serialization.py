@@ -0,0 +1,120 @@
+"""响应序列化基准 - 对比 FastAPI 默认序列化与 typed_response 快速路径
+
+    python -m bench.serialization --results 20 --repeat 2000
+
+每种方式都从端点返回值开始计时，到得到响应体字节为止：
+    generic     旧的 Dict[str, Any] 响应模型，经 FastAPI 校验、转换后用标准库 json 编码
+    validated   类型化响应模型，经 FastAPI 校验、转换后用标准库 json 编码
+    fast        typed_response：跳过校验，直接编码
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import BaseModel
+from app.models.response import SearchResponse, RouteResponse
+from app.services.serialization import typed_response, orjson
+
+
+class GenericResponse(BaseModel):
+    """改造前的响应模型"""
+    success: bool
+    data: Optional[Dict[str, Any]] = None
+    message: Optional[str] = None
+
+
+def sample_pois(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": f"B000A{index:05d}",
+            "name": f"全季酒店(国贸{index}店)",
+            "location": {"lat": 39.9087 + index * 1e-4, "lng": 116.3975 + index * 1e-4},
+            "address": f"朝阳区建国路{index}号",
+            "phone": "010-65001234",
+            "category": "酒店",
+            "distance": 120.0 + index * 37.5,
+            "nearest_subway": {"name": "国贸", "line": "1号线、10号线", "exit": "A口", "distance": 300.0 + index},
+        }
+        for index in range(count)
+    ]
+
+
+def sample_route(steps: int) -> Dict[str, Any]:
+    return {
+        "distance": 1830.0,
+        "duration": 24.5,
+        "mode": "walking",
+        "steps": [
+            {"instruction": f"沿建国路向东步行{index * 10 + 50}米右转", "distance": index * 10 + 50.0, "duration": 1.2}
+            for index in range(steps)
+        ],
+    }
+
+
+def fastapi_default(model, make_content: Callable[[], Dict[str, Any]], loop) -> Callable[[], bytes]:
+    """模拟端点返回模型实例后 FastAPI 的处理：校验、转换为 JSON 兼容对象、编码"""
+    field = create_response_field(name="response", type_=model)
+
+    def run() -> bytes:
+        content = loop.run_until_complete(serialize_response(field=field, response_content=model(**make_content())))
+        return JSONResponse(content).body
+
+    return run
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """单次调用耗时（微秒），取 5 轮中最快的一轮"""
+    func()
+    best = float("inf")
+    for _ in range(5):
+        started_at = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        best = min(best, (time.perf_counter() - started_at) / repeat)
+    return best * 1e6
+
+
+def run_bench(results: int, steps: int, repeat: int) -> Dict[str, Any]:
+    loop = asyncio.new_event_loop()
+    pois = sample_pois(results)
+    route = sample_route(steps)
+    cases = {
+        "search": (SearchResponse, lambda: {"success": True, "data": {"total": len(pois), "results": pois}, "message": None}),
+        "route": (RouteResponse, lambda: {"success": True, "data": route, "message": None}),
+    }
+
+    report: Dict[str, Any] = {
+        "config": {"results": results, "steps": steps, "repeat": repeat, "encoder": "orjson" if orjson else "json"}
+    }
+    try:
+        for name, (model, make_content) in cases.items():
+            timings = {
+                "generic": measure(fastapi_default(GenericResponse, make_content, loop), repeat),
+                "validated": measure(fastapi_default(model, make_content, loop), repeat),
+                "fast": measure(lambda: typed_response(model, **make_content()).body, repeat),
+            }
+            report[name] = {
+                "us_per_response": {key: round(value, 1) for key, value in timings.items()},
+                "speedup_vs_generic": round(timings["generic"] / timings["fast"], 1),
+                "bytes": len(typed_response(model, **make_content()).body),
+            }
+    finally:
+        loop.close()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="响应序列化基准")
+    parser.add_argument("--results", type=int, default=20, help="搜索结果数")
+    parser.add_argument("--steps", type=int, default=10, help="路线步骤数")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run_bench(args.results, args.steps, args.repeat), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -105,11 +105,81 @@ def test_distance_calculation():
     print(f"\n天安门 → 国贸")
     print(f"距离: {distance:.0f}米 ({distance/1000:.2f}公里)")
 
+def test_query_key():
+    """测试缓存键规范化：只去掉虚词，不拆开以虚词字结尾的词"""
+    from app.services.text_normalize import normalize_query_key
+
+    print("\n" + "=" * 50)
+    print("测试缓存键规范化")
+    print("=" * 50)
+
+    same = [
+        ("找附近的酒店", "请帮我找附近酒店吧"),
+        ("附近的网吧", "附近网吧呢？"),
+    ]
+    different = [
+        ("找个酒吧", "找个酒"),
+        ("附近的网吧", "附近的网"),
+        ("打个的士", "打个士"),
+    ]
+    for left, right in same:
+        print(f"\n{left} == {right}")
+        assert normalize_query_key(left) == normalize_query_key(right)
+    for left, right in different:
+        print(f"\n{left} != {right}")
+        assert normalize_query_key(left) != normalize_query_key(right)
+
+def test_canonicalize_numbers():
+    """测试数字规范化：阿拉伯数字后的 千/百、千米单位和小数点后的零"""
+    from app.services.text_normalize import canonicalize_text, normalize_query_key
+
+    print("\n" + "=" * 50)
+    print("测试数字规范化")
+    print("=" * 50)
+
+    cases = [
+        ("附近3千米内的酒店", "附近3千米内的酒店"),
+        ("1千米以内便利店", "1千米以内便利店"),
+        ("5百米内便利店", "500米内便利店"),
+        ("三千米内的酒店", "3千米内的酒店"),
+        ("1.05公里内酒店", "1.05公里内酒店"),
+    ]
+    for query, expected in cases:
+        print(f"\n{query} -> {canonicalize_text(query)}")
+        assert canonicalize_text(query) == expected
+    assert normalize_query_key("附近3千米内的酒店") != normalize_query_key("附近31000米内的酒店")
+    assert normalize_query_key("1.05公里内酒店") != normalize_query_key("1.5公里内酒店")
+
+def test_lexicon_quantities():
+    """测试规则引擎的半径和数量提取（千米、百米、小数公里）"""
+    from app.services.lexicon import lexicon
+
+    print("\n" + "=" * 50)
+    print("测试规则引擎半径提取")
+    print("=" * 50)
+
+    cases = [
+        ("附近3千米内的酒店", 3000),
+        ("1千米以内便利店", 1000),
+        ("5百米内便利店", 500),
+        ("三百米内的药店", 300),
+        ("1.05公里内酒店", 1050),
+        ("附近2公里的3家咖啡", 2000),
+    ]
+    for query, radius in cases:
+        result = lexicon.extract(query)
+        print(f"\n{query} -> 半径 {result['radius']}米")
+        assert result["radius"] == radius
+    assert lexicon.extract("附近2公里的3家咖啡")["limit"] == 3
+
 def main():
     print("\nDollyNav API 功能测试\n")
     
     test_rule_engine()
     test_distance_calculation()
+    test_query_key()
+    test_canonicalize_numbers()
+    test_lexicon_quantities()
     
     print("\n" + "=" * 50)
     print("测试完成！")
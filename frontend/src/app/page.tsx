@@ -46,8 +46,8 @@ export default function Home() {
     setSearchResults([])
 
     try {
-      // 1. 解析查询
-      const parseResponse = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/parse-query`, {
+      // 解析、搜索、排序一次请求完成
+      const queryResponse = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/query`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -56,38 +56,19 @@ export default function Home() {
         }),
       })
 
-      const parseData = await parseResponse.json()
-      
-      if (!parseData.success) {
-        alert(parseData.message || '解析失败')
-        setLoading(false)
+      const queryData = await queryResponse.json()
+
+      if (!queryResponse.ok) {
+        alert(queryData.detail || '搜索失败')
         return
       }
 
-      setParsedQuery(parseData)
-
-      // 2. 搜索
-      const searchResponse = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/search`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          category: parseData.data.category,
-          subcategory: parseData.data.subcategory,
-          radius: parseData.data.radius,
-          limit: parseData.data.limit,
-          sort_by: parseData.data.sort_by,
-          brands: parseData.data.filters?.brands,
-          proximity: parseData.data.filters?.proximity,
-          location: userLocation,
-        }),
-      })
-
-      const searchData = await searchResponse.json()
+      setParsedQuery({ data: queryData.data.query, display: queryData.data.display })
 
-      if (searchData.success) {
-        setSearchResults(searchData.data.results || [])
+      if (queryData.success) {
+        setSearchResults(queryData.data.results || [])
       } else {
-        alert(searchData.message || '搜索失败')
+        alert(queryData.message || '搜索失败')
       }
     } catch (error) {
       console.error('搜索错误:', error)